@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Timing harness for the SEO observers which run on every page view.
+
+Calls the page_title/meta_* observers for every page kind, for single
+media pages and for listing pages, as well as save_fields, and reports the
+time per call and the number of SQL statements. It uses an in-memory
+SQLite database with stubbed pylons globals, so the numbers are only
+useful to compare two checkouts on the same machine:
+
+    python benchmarks/bench_observers.py --sizes 10,100,1000
+
+MediaCore (and thus Pylons and SQLAlchemy) must be importable. No
+reference numbers are kept in the repository.
+"""
+
+import optparse
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pylons
+from pylons.util import AttribSafeContextObj
+from routes import Mapper
+from routes.util import URLGenerator
+from sqlalchemy import create_engine, event
+from webob import Request
+
+from mediacore.model import Author, Media, init_model
+from mediacore.model.meta import DBSession, metadata
+from mediacore.model.settings import Setting
+
+from mediacoreext.simplestation.seo import mediacore_plugin as plugin
+from mediacoreext.simplestation.seo.lib.resolver import get_head_cache
+from mediacoreext.simplestation.seo.lib.settings_cache import (get_settings_cache,
+    SEO_SETTING_KEYS, SETTINGS_VERSION_KEY)
+
+PAGE_KINDS = [
+    ('explore', dict(media='all')),
+    ('podcast', dict(podcast='all')),
+    ('category', dict(category='all')),
+    ('upload', dict(upload='all')),
+    ('none', dict()),
+]
+
+# named explicitly, the observers may be wrapped by @instrumented
+SINGLE_PAGE_OBSERVERS = [
+    ('seo_title', plugin.seo_title),
+    ('seo_meta_description', plugin.seo_meta_description),
+    ('seo_meta_keywords', plugin.seo_meta_keywords),
+]
+
+
+class QueryCounter(object):
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self)
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+def create_mapper():
+    """Return the routes needed to generate the URLs used by save_fields."""
+    mapper = Mapper()
+    mapper.minimization = False
+    mapper.explicit = False
+    plugin.add_routes(mapper)
+    mapper.connect('/media/{slug}', controller='media', action='view')
+    mapper.connect('/categories/{slug}', controller='categories', action='index')
+    mapper.connect('/{controller}/{action}')
+    return mapper
+
+def setup_environment():
+    engine = create_engine('sqlite://')
+    init_model(engine)
+    metadata.create_all(engine)
+    # save_fields probes the thumbnails (there are none) and generates the
+    # URLs for the structured data
+    image_dir = tempfile.mkdtemp(prefix='seo-bench-')
+    pylons.config.update({
+        'seo.settings_check_interval': 1.0,
+        'image_dir': image_dir,
+        'thumb_sizes': {'media': {'l': (410, 273)}},
+    })
+    pylons.app_globals._push_object(AttribSafeContextObj())
+    # only read for the site name of the social tags; the SEO settings
+    # come from the settings rows below through SEOSettingsCache
+    pylons.app_globals.settings = {}
+    pylons.tmpl_context._push_object(AttribSafeContextObj())
+    request = Request.blank('/')
+    pylons.request._push_object(request)
+    pylons.url._push_object(URLGenerator(create_mapper(), request.environ))
+
+    for key in SEO_SETTING_KEYS:
+        DBSession.add(Setting(key, u'%s value' % key))
+    DBSession.add(Setting(SETTINGS_VERSION_KEY, u'1'))
+    DBSession.commit()
+    version, settings = get_settings_cache().get()
+    if version != 1 or settings.get(SEO_SETTING_KEYS[0]) != u'%s value' % SEO_SETTING_KEYS[0]:
+        raise AssertionError('The SEO settings cache does not see the settings.')
+    return engine, image_dir
+
+def create_media(count):
+    now = datetime.now()
+    for i in range(count):
+        media = Media()
+        media.title = u'Media %d' % i
+        media.slug = u'media-%d' % i
+        media.description = u'<p>Description of media %d</p>' % i
+        media.author = Author(u'Author', u'author@example.com')
+        media.reviewed = media.encoded = media.publishable = True
+        media.publish_on = now - timedelta(days=1)
+        if i % 2:
+            media.meta[u'seo_page_title'] = u'SEO title %d' % i
+            media.meta[u'seo_meta_description'] = u'SEO description %d' % i
+        DBSession.add(media)
+    DBSession.commit()
+
+def load_media(count):
+    DBSession.expunge_all()
+    return Media.query.order_by(Media.id).limit(count).all()
+
+def measure(counter, func, repeat):
+    """Return (microseconds per call, statements per call)."""
+    queries = counter.count
+    start = time.time()
+    for i in range(repeat):
+        func()
+    elapsed = time.time() - start
+    return (elapsed / repeat * 1e6, float(counter.count - queries) / repeat)
+
+def render_head(**kwargs):
+    plugin.seo_title(**kwargs)
+    plugin.seo_meta_description(**kwargs)
+    plugin.seo_meta_keywords(**kwargs)
+    plugin.seo_meta_robots(**kwargs)
+
+def report(name, result):
+    usec, queries = result
+    sys.stdout.write('%-40s %12.1f us %10.2f queries\n' % (name, usec, queries))
+
+def run(engine, options, sizes):
+    counter = QueryCounter(engine)
+    create_media(max(sizes))
+
+    sys.stdout.write('== page kinds (all four observers per call)\n')
+    for name, kwargs in PAGE_KINDS:
+        report(name, measure(counter, lambda: render_head(**kwargs), options.repeat))
+
+    sys.stdout.write('== single media page\n')
+    media = load_media(1)[0]
+    for name, observer in SINGLE_PAGE_OBSERVERS:
+        get_head_cache().clear()
+        report('%s (cold)' % name,
+               measure(counter, lambda observer=observer:
+                       observer(media=load_media(1)[0]), 1))
+        report('%s (warm)' % name,
+               measure(counter, lambda observer=observer: observer(media=media),
+                       options.repeat))
+
+    sys.stdout.write('== listing pages (per page)\n')
+    for size in sizes:
+        def render_listing(preload):
+            items = load_media(size)
+            get_head_cache().clear()
+            if preload:
+                plugin.preload_listing_fields(media=items)
+            for item in items:
+                render_head(media=item)
+        report('%d items, lazy meta' % size,
+               measure(counter, lambda: render_listing(False), 3))
+        report('%d items, preloaded meta' % size,
+               measure(counter, lambda: render_listing(True), 3))
+
+    sys.stdout.write('== save_fields\n')
+    media = load_media(1)[0]
+    def save(i=[0]):
+        i[0] += 1
+        pylons.tmpl_context.form_values = {'seo': {
+            'page_title': u'Title %d' % i[0],
+            'meta_description': u'Description',
+            'meta_keywords': u'',
+        }}
+        plugin.save_fields(media_id=media.id, media=media)
+        DBSession.flush()
+    report('save_fields (changed values)', measure(counter, save, 50))
+    def save_unchanged():
+        plugin.save_fields(media_id=media.id, media=media)
+        DBSession.flush()
+    report('save_fields (unchanged values)', measure(counter, save_unchanged, 50))
+    DBSession.rollback()
+    return 0
+
+def main():
+    parser = optparse.OptionParser(description=__doc__.strip().split('\n')[0])
+    parser.add_option('--sizes', default='10,100,1000',
+        help='comma separated sizes of the listing pages (default: 10,100,1000)')
+    parser.add_option('--repeat', type='int', default=200,
+        help='calls per single page measurement (default: 200)')
+    options, args = parser.parse_args()
+    sizes = [int(size) for size in options.sizes.split(',')]
+
+    engine, image_dir = setup_environment()
+    try:
+        return run(engine, options, sizes)
+    finally:
+        shutil.rmtree(image_dir)
+
+if __name__ == '__main__':
+    sys.exit(main())
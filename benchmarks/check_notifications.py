@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Check the IndexNow and CDN purge paths against a local stub server.
+
+Starts an HTTP server on localhost which records every request, points
+``seo.indexnow_endpoint`` and ``seo.cdn_purge_url`` to it and checks that
+URLs and surrogate keys are
+
+- only sent once the transaction is committed, never after a rollback,
+- sent once per batch even if they were queued several times,
+- sent again after a failed request.
+
+    python benchmarks/check_notifications.py
+
+Exits with status 1 if a check failed.
+MediaCore (and thus Pylons and SQLAlchemy) must be importable.
+"""
+
+import BaseHTTPServer
+import json
+import optparse
+import sys
+import threading
+import time
+
+import pylons
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# registers the after_commit/after_rollback listeners of the plugin
+from mediacoreext.simplestation.seo import mediacore_plugin
+from mediacoreext.simplestation.seo.lib.cdn import (get_purge_queue,
+    media_key, queue_purge, SETTINGS_KEY)
+from mediacoreext.simplestation.seo.lib.indexnow import queue_ping
+
+INDEXNOW_PATH = '/indexnow'
+PURGE_PATH = '/purge'
+SITE = 'http://media.example.com'
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Record the JSON body of every POST, fail if asked to."""
+
+    def do_POST(self):
+        length = int(self.headers.getheader('content-length') or 0)
+        body = json.loads(self.rfile.read(length))
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers), body))
+            failing = server.failures > 0
+            if failing:
+                server.failures -= 1
+        self.send_response(failing and 500 or 200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server():
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    server.failures = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def requests_to(server, path, count, timeout):
+    """Wait until ``count`` requests reached ``path`` and return them all."""
+    stop = time.time() + timeout
+    while True:
+        with server.lock:
+            requests = [(headers, body) for request_path, headers, body
+                        in server.requests if request_path == path]
+        if len(requests) >= count or time.time() > stop:
+            return requests
+        time.sleep(0.05)
+
+def run_transaction(session, commit, urls=(), keys=()):
+    # the session events are only sent for transactions which did something
+    session.execute('SELECT 1')
+    queue_ping(list(urls))
+    queue_purge(list(keys))
+    if commit:
+        session.commit()
+    else:
+        session.rollback()
+
+
+class Checks(object):
+    def __init__(self):
+        self.failed = 0
+
+    def __call__(self, name, condition, detail=None):
+        sys.stdout.write('%-60s %s\n' % (name, condition and 'ok' or 'FAILED'))
+        if not condition:
+            self.failed += 1
+            if detail is not None:
+                sys.stdout.write('    got: %r\n' % (detail,))
+
+def run(server, options):
+    check = Checks()
+    session = sessionmaker(bind=create_engine('sqlite://'))()
+    # wait at least this long for something which must not happen
+    quiet = options.window * 3 + 0.5
+
+    check('purging is enabled', get_purge_queue() is not None)
+
+    run_transaction(session, False, urls=[SITE + '/media/rolled-back'],
+                    keys=[media_key(1)])
+    time.sleep(quiet)
+    check('nothing is sent after a rollback', not server.requests,
+          server.requests)
+
+    run_transaction(session, True,
+        urls=[SITE + '/media/a', SITE + '/media/a', SITE + '/media/b'],
+        keys=[media_key(2), SETTINGS_KEY])
+    run_transaction(session, True, keys=[media_key(2)])
+    pings = requests_to(server, INDEXNOW_PATH, 1, options.timeout)
+    purges = requests_to(server, PURGE_PATH, 1, options.timeout)
+    check('committed URLs are pinged once',
+          len(pings) == 1 and sorted(pings[0][1]['urlList'])
+              == [SITE + '/media/a', SITE + '/media/b'], pings)
+    check('the IndexNow key is sent',
+          pings and pings[0][1]['key'] == options.key, pings)
+    check('committed keys of both transactions are purged once',
+          len(purges) == 1 and purges[0][1]['surrogate_keys']
+              == sorted([media_key(2), SETTINGS_KEY]), purges)
+    check('the configured purge headers are sent',
+          purges and purges[0][0].get('fastly-key') == 'secret', purges)
+
+    server.failures = 1
+    run_transaction(session, True, keys=[media_key(3)])
+    purges = requests_to(server, PURGE_PATH, 3, options.window * 4 +
+                         options.timeout)
+    check('a failed purge is retried',
+          len(purges) == 3 and purges[2][1]['surrogate_keys'] == [media_key(3)],
+          purges[1:])
+
+    time.sleep(quiet)
+    with server.lock:
+        count = len(server.requests)
+    check('nothing else is sent', count == 4, server.requests)
+    return check.failed and 1 or 0
+
+def main():
+    parser = optparse.OptionParser(description=__doc__.strip().split('\n')[0])
+    parser.add_option('--window', type='float', default=0.2,
+        help='coalescing window and retry backoff in seconds (default: 0.2)')
+    parser.add_option('--timeout', type='float', default=5.0,
+        help='seconds to wait for an expected request (default: 5)')
+    options, args = parser.parse_args()
+    options.key = 'check-notifications-key'
+
+    server = start_server()
+    stub_url = 'http://127.0.0.1:%d' % server.server_port
+    pylons.config.update({
+        'seo.indexnow_key': options.key,
+        'seo.indexnow_key_location': SITE + '/seo/indexnow-key.txt',
+        'seo.indexnow_endpoint': stub_url + INDEXNOW_PATH,
+        'seo.indexnow_window': options.window,
+        'seo.indexnow_backoff': options.window,
+        'seo.cdn_purge_url': stub_url + PURGE_PATH,
+        'seo.cdn_purge_headers': 'Fastly-Key: secret',
+        'seo.cdn_purge_window': options.window,
+        'seo.cdn_purge_backoff': options.window,
+    })
+    try:
+        return run(server, options)
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Measure how long a worker spends importing the SEO plugin.
+
+Every run starts a fresh interpreter which first imports MediaCore itself
+(this is paid by every worker anyway and is reported separately) and then
+the plugin entry point and all plugin controllers, like MediaCore does on
+startup. The time to build the admin forms on first use is shown as well:
+
+    python benchmarks/import_time.py --runs 10
+
+Compare the numbers of two checkouts to verify a change in startup time.
+MediaCore (and thus Pylons and SQLAlchemy) must be importable.
+"""
+
+import optparse
+import subprocess
+import sys
+
+PLUGIN = 'mediacoreext.simplestation.seo'
+CONTROLLERS = [
+    'controllers.redirects',
+    'controllers.robots',
+    'controllers.sitemaps',
+    'controllers.stats',
+    'controllers.admin.audit',
+    'controllers.admin.bulk',
+    'controllers.admin.categories',
+    'controllers.admin.settings',
+    'controllers.admin.stats',
+]
+FORMS = [
+    ('controllers.admin.bulk', 'seo_bulk_edit_form'),
+    ('controllers.admin.categories', 'seo_category_form'),
+    ('controllers.admin.settings', 'seo_settings_form'),
+]
+
+MEASURE = """
+import time
+start = time.time()
+import mediacore.model, mediacore.plugin.events, mediacore.lib.base
+core = time.time()
+import %(plugin)s.mediacore_plugin
+%(controllers)s
+plugin = time.time()
+%(forms)s
+forms = time.time()
+print('%%f %%f %%f' %% (core - start, plugin - core, forms - plugin))
+"""
+
+def measure_once():
+    controllers = '\n'.join('import %s.%s' % (PLUGIN, name) for name in CONTROLLERS)
+    forms = '\n'.join(
+        'getattr(__import__(%r, fromlist=["x"]).%s, "get_form", lambda: None)()'
+        % ('%s.%s' % (PLUGIN, module), name) for module, name in FORMS)
+    code = MEASURE % dict(plugin=PLUGIN, controllers=controllers, forms=forms)
+    output = subprocess.Popen([sys.executable, '-c', code],
+                              stdout=subprocess.PIPE).communicate()[0]
+    return [float(value) for value in output.split()]
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [--runs N]')
+    parser.add_option('--runs', type='int', default=5,
+                      help='number of fresh interpreters to measure')
+    options, args = parser.parse_args()
+
+    results = [measure_once() for run in range(options.runs)]
+    columns = zip(*results)
+    for label, values in zip(('mediacore', 'plugin + controllers', 'admin forms (first use)'), columns):
+        sys.stdout.write('%-26s median %8.1f ms  min %8.1f ms\n'
+                         % (label, median(values) * 1000, min(values) * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Command line tools of the SEO plugin.
+
+All commands take the path of the MediaCore deployment config as their
+first argument, e.g. ``mediacore-seo-sitemaps deployment.ini``.
+"""
+
+import sys
+from urlparse import urlsplit
+
+import pylons
+from pylons import config
+from routes.util import URLGenerator
+
+from mediacore.lib.cli_commands import LoadAppCommand, load_app
+from mediacore.model.media import media
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.lib.batches import id_batches
+
+__all__ = [
+    'BATCH_OPTIONS',
+    'process_media_batches',
+    'run_command',
+]
+
+# options for commands using process_media_batches()
+BATCH_OPTIONS = [
+    (('--batch-size',), dict(dest='batch_size', type='int', default=1000,
+        help='number of media per transaction (default: 1000)')),
+    (('--after-id',), dict(dest='after_id', type='int', default=0,
+        help='only process media with a greater id')),
+]
+
+def push_url_generator():
+    """Make ``url_for`` usable outside of a web request.
+
+    Absolute URLs are generated for the site configured as ``seo.site_url``
+    (e.g. 'http://media.example.com/').
+
+    """
+    site_url = config.get('seo.site_url')
+    if not site_url:
+        raise ValueError('Please configure seo.site_url in your config file.')
+    parts = urlsplit(site_url)
+    default_port = parts.scheme == 'https' and '443' or '80'
+    environ = {
+        'HTTP_HOST': parts.netloc,
+        'SERVER_NAME': parts.hostname,
+        'SERVER_PORT': str(parts.port or default_port),
+        'SCRIPT_NAME': parts.path.rstrip('/'),
+        'wsgi.url_scheme': parts.scheme,
+    }
+    pylons.url._push_object(URLGenerator(config['routes.map'], environ))
+
+def run_command(name, description, main, options=()):
+    """Load the MediaCore app and run ``main(options, args)``.
+
+    :param options: A list of ``(args, kwargs)`` tuples which are passed
+        to the option parser's ``add_option``.
+    :returns: Never, exits with the return value of ``main``.
+
+    """
+    cmd = LoadAppCommand(name, description)
+    for args, kwargs in options:
+        cmd.parser.add_option(*args, **kwargs)
+    load_app(cmd)
+    push_url_generator()
+    sys.exit(main(cmd.options, cmd.args[1:]))
+
+def process_media_batches(options, process, counted='changed'):
+    """Call ``process(media_ids)`` for all media, batch by batch.
+
+    Every batch of ``--batch-size`` media is committed on its own and the
+    progress is reported with the last processed id, so an interrupted
+    run can be resumed with ``--after-id``.
+
+    :param process: Returns the number of changes, which are reported as
+        ``counted``.
+
+    """
+    total = changed = 0
+    for media_ids in id_batches(DBSession.execute, media.c.id,
+                                options.after_id, options.batch_size):
+        changed += process(media_ids)
+        DBSession.commit()
+        total += len(media_ids)
+        sys.stderr.write('%d media processed, %d %s (last id: %d)\n'
+                         % (total, changed, counted, media_ids[-1]))
+    return 0
@@ -0,0 +1,59 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+import sys
+
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.commands import run_command
+from mediacoreext.simplestation.seo.lib.audit import (audit_rows, csv_lines,
+    ISSUES, save_audit_summary, SEOAudit)
+
+_script_name = 'mediacore-seo-audit'
+_script_description = """Check the SEO values of all media.
+
+Writes one CSV line per issue (missing or too long titles and descriptions,
+duplicate descriptions) while the catalogue is scanned. The summary is
+stored for the admin report."""
+
+def audit(options, args):
+    if options.output == '-':
+        output = sys.stdout
+    else:
+        output = open(options.output, 'wb')
+    engine = DBSession.bind
+    connection = engine.connect()
+    seo_audit = SEOAudit()
+    try:
+        lines = csv_lines(seo_audit.run(audit_rows(connection)))
+        for count, line in enumerate(lines):
+            output.write(line)
+            if options.progress and count % options.progress == 0:
+                output.flush()
+    finally:
+        connection.close()
+        if output is not sys.stdout:
+            output.close()
+    summary = seo_audit.summary()
+    save_audit_summary(summary)
+    DBSession.commit()
+    sys.stderr.write('%d media checked\n' % summary['media'])
+    for issue in ISSUES:
+        sys.stderr.write('%-22s %d\n' % (issue, summary['issues'][issue]))
+    return 0
+
+def main():
+    run_command(_script_name, _script_description, audit, options=[
+        (('--output', '-o'), dict(dest='output', default='-',
+            help='CSV file to write (default: stdout)')),
+        (('--progress',), dict(dest='progress', type='int', default=1000,
+            help='flush the output every N issues, 0 only flushes at the end '
+                 '(default: 1000)')),
+    ])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.commands import (BATCH_OPTIONS,
+    process_media_batches, run_command)
+from mediacoreext.simplestation.seo.lib.fallbacks import (auto_meta_values,
+    fallback_rows)
+from mediacoreext.simplestation.seo.lib.media_meta import update_seo_meta
+
+_script_name = 'mediacore-seo-fallbacks'
+_script_description = """Generate the meta description and keywords fallbacks for all media.
+
+New and edited media get their fallbacks when they are saved, this command
+fills them in for the existing catalogue. It can be interrupted and resumed
+with --after-id."""
+
+def backfill(options, args):
+    def process(media_ids):
+        rows = fallback_rows(DBSession.connection(), media_ids)
+        changes = dict((id, auto_meta_values(title, description, tag_names))
+                       for id, title, description, tag_names in rows)
+        return len(update_seo_meta(changes))
+    return process_media_batches(options, process)
+
+def main():
+    run_command(_script_name, _script_description, backfill, options=BATCH_OPTIONS)
+
+if __name__ == '__main__':
+    main()
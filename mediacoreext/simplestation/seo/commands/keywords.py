@@ -0,0 +1,33 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.commands import (BATCH_OPTIONS,
+    process_media_batches, run_command)
+from mediacoreext.simplestation.seo.lib.keywords import (index_keywords,
+    keyword_index_rows)
+
+_script_name = 'mediacore-seo-keywords'
+_script_description = """Build the SEO keyword index for all media.
+
+Media are indexed when they are saved, this command indexes the existing
+catalogue. It can be interrupted and resumed with --after-id."""
+
+def reindex(options, args):
+    def process(media_ids):
+        connection = DBSession.connection()
+        values = dict((id, keywords or auto_keywords) for id, keywords, auto_keywords
+                      in keyword_index_rows(connection, media_ids))
+        return index_keywords(connection, values)
+    return process_media_batches(options, process, counted='links changed')
+
+def main():
+    run_command(_script_name, _script_description, reindex, options=BATCH_OPTIONS)
+
+if __name__ == '__main__':
+    main()
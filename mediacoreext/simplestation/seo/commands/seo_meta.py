@@ -0,0 +1,184 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Bulk import and export of the per-media SEO meta.
+
+Both commands read and write CSV (with a header line) or JSON lines with
+the fields 'id' or 'slug', 'page_title', 'meta_description' and
+'meta_keywords'. On import a field which is missing from a row is left
+unchanged while an empty field removes the stored value.
+"""
+
+import csv
+import json
+import sys
+
+from sqlalchemy import and_, select
+
+from mediacore.model.media import media, media_meta
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.commands import run_command
+from mediacoreext.simplestation.seo.lib.batches import chunks
+from mediacoreext.simplestation.seo.lib.media_meta import update_seo_meta
+
+FIELDS = ('page_title', 'meta_description', 'meta_keywords')
+
+format_option = (('--format',), dict(dest='format', default=None,
+    choices=['csv', 'jsonl'],
+    help='file format, guessed from the file name by default'))
+
+def guess_format(options, filename):
+    if options.format:
+        return options.format
+    if filename.endswith('.jsonl') or filename.endswith('.json'):
+        return 'jsonl'
+    return 'csv'
+
+def open_file(filename, mode):
+    if filename == '-':
+        return mode.startswith('r') and sys.stdin or sys.stdout
+    return open(filename, mode)
+
+def read_rows(fp, format):
+    """Yield one dict with unicode values per row of the input file."""
+    if format == 'jsonl':
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
+        return
+    for row in csv.DictReader(fp):
+        yield dict((key, value.decode('utf-8'))
+                   for key, value in row.iteritems() if value is not None)
+
+def row_reference(row):
+    """Return ``('id', value)`` or ``('slug', value)`` for an input row."""
+    if row.get('id') not in (None, u''):
+        return 'id', unicode(row['id']).strip()
+    return 'slug', row.get('slug') or None
+
+def resolve_media_ids(rows):
+    """Return the id of the existing media item of every row.
+
+    Rows are matched by their 'id' or, if they have none, their 'slug'.
+    All numeric ids and all slugs of the batch are checked with one
+    ``IN`` query each (per 500 values).
+
+    :returns: A dict mapping ``('id', value)`` or ``('slug', value)`` to the
+        media id. Unknown media and non-numeric ids are missing.
+
+    """
+    ids = {}
+    slugs = set()
+    for row in rows:
+        kind, value = row_reference(row)
+        if kind == 'id' and value.isdigit():
+            ids[int(value)] = value
+        elif kind == 'slug':
+            slugs.add(value)
+    found = {}
+    for chunk in chunks(ids):
+        query = select([media.c.id], media.c.id.in_(chunk))
+        for media_id, in DBSession.execute(query):
+            found[('id', ids[media_id])] = media_id
+    for chunk in chunks(slugs):
+        query = select([media.c.slug, media.c.id], media.c.slug.in_(chunk))
+        for slug, media_id in DBSession.execute(query):
+            found[('slug', slug)] = media_id
+    return found
+
+def import_batch(rows, report):
+    """Apply the given rows in one transaction.
+
+    Rows referring to a media item which does not exist (or with an id
+    which is not a number) are reported and skipped.
+
+    """
+    media_ids = resolve_media_ids(rows)
+    changes = {}
+    for row in rows:
+        reference = row_reference(row)
+        media_id = media_ids.get(reference)
+        if media_id is None:
+            kind, value = reference
+            if kind == 'id' and not value.isdigit():
+                report.write('Skipping row with invalid id %r\n' % value)
+            else:
+                report.write('Skipping unknown media %r\n' % value)
+            continue
+        changes[media_id] = dict((u'seo_%s' % field, row[field] or None)
+                                 for field in FIELDS if field in row)
+    changed_ids = update_seo_meta(changes)
+    DBSession.commit()
+    return len(changed_ids)
+
+def import_meta(options, args):
+    if len(args) != 1:
+        sys.stderr.write('Please specify the file to import (or - for stdin).\n')
+        return 1
+    format = guess_format(options, args[0])
+    fp = open_file(args[0], 'rb')
+    total = changed = 0
+    batch = []
+    for row in read_rows(fp, format):
+        batch.append(row)
+        if len(batch) >= options.batch_size:
+            changed += import_batch(batch, sys.stderr)
+            total += len(batch)
+            batch = []
+            sys.stderr.write('%d rows processed, %d media changed\n' % (total, changed))
+    if batch:
+        changed += import_batch(batch, sys.stderr)
+        total += len(batch)
+    sys.stderr.write('Done: %d rows processed, %d media changed\n' % (total, changed))
+    return 0
+
+def exported_rows(connection):
+    """Yield one dict per media item with its SEO meta."""
+    aliases = dict((field, media_meta.alias(field)) for field in FIELDS)
+    joined = media
+    for field, alias in aliases.iteritems():
+        joined = joined.outerjoin(alias, and_(alias.c.media_id == media.c.id,
+                                              alias.c.key == u'seo_%s' % field))
+    columns = [media.c.id, media.c.slug] + [aliases[field].c.value for field in FIELDS]
+    query = select(columns, from_obj=[joined]).order_by(media.c.id)
+    result = connection.execution_options(stream_results=True).execute(query)
+    for row in result:
+        yield dict(zip(('id', 'slug') + FIELDS, row))
+
+def export_meta(options, args):
+    filename = args and args[0] or '-'
+    format = guess_format(options, filename)
+    fp = open_file(filename, 'wb')
+    if format == 'csv':
+        writer = csv.writer(fp)
+        writer.writerow(('id', 'slug') + FIELDS)
+    connection = DBSession.bind.connect()
+    try:
+        for count, row in enumerate(exported_rows(connection)):
+            if format == 'jsonl':
+                fp.write(json.dumps(row) + '\n')
+            else:
+                writer.writerow([row['id']] + [(row[key] or u'').encode('utf-8')
+                                               for key in ('slug',) + FIELDS])
+            if count and count % 10000 == 0:
+                sys.stderr.write('%d media exported\n' % count)
+    finally:
+        connection.close()
+    fp.flush()
+    return 0
+
+def import_main():
+    run_command('mediacore-seo-import', __doc__, import_meta, options=[
+        format_option,
+        (('--batch-size',), dict(dest='batch_size', type='int', default=1000,
+            help='number of rows per transaction (default: 1000)')),
+    ])
+
+def export_main():
+    run_command('mediacore-seo-export', __doc__, export_meta, options=[
+        format_option,
+    ])
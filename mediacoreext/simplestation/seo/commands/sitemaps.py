@@ -0,0 +1,49 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+import sys
+
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.commands import run_command
+from mediacoreext.simplestation.seo.lib.resolver import get_seo_profile
+from mediacoreext.simplestation.seo.lib.sitemap import sitemap_urls
+from mediacoreext.simplestation.seo.lib.sitemap_files import get_sitemap_snapshot
+
+_script_name = 'mediacore-seo-sitemaps'
+_script_description = """Build the gzip-compressed sitemap files in seo.sitemap_dir.
+
+Only shards with changed media are rewritten unless --full is given. Run it
+from cron as often as your sitemaps should be refreshed."""
+
+def build_sitemaps(options, args):
+    snapshot = get_sitemap_snapshot()
+    if snapshot is None:
+        sys.stderr.write('Please configure seo.sitemap_dir in your config file.\n')
+        return 1
+    profile = get_seo_profile()
+    def indexed(category_id):
+        return profile.resolve_category(category_id)['robots']
+    connection = DBSession.bind.connect()
+    try:
+        shards = snapshot.build(connection, sitemap_urls(),
+            include_categories=not profile.noindex_categories,
+            full=options.full, indexed_category=indexed)
+    finally:
+        connection.close()
+    sys.stdout.write('Rebuilt %d sitemap shard(s) in %s\n'
+                     % (len(shards), snapshot.directory))
+    return 0
+
+def main():
+    run_command(_script_name, _script_description, build_sitemaps, options=[
+        (('--full',), dict(action='store_true', dest='full', default=False,
+            help='rewrite all shards, not only the changed ones')),
+    ])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.commands import (BATCH_OPTIONS,
+    process_media_batches, run_command)
+from mediacoreext.simplestation.seo.lib.media_meta import update_seo_meta
+from mediacoreext.simplestation.seo.lib.sitemap import sitemap_urls
+from mediacoreext.simplestation.seo.lib.structured_data import (details_jsonld,
+    JSONLD_META_KEY, structured_data_rows)
+
+_script_name = 'mediacore-seo-structured-data'
+_script_description = """Rebuild the stored JSON-LD VideoObject of all media.
+
+Media get their JSON-LD when they are saved, this command builds it for the
+existing catalogue. It can be interrupted and resumed with --after-id."""
+
+def rebuild(options, args):
+    urls = sitemap_urls()
+    def process(media_ids):
+        rows = structured_data_rows(DBSession.connection(), media_ids)
+        changes = dict((details['id'],
+                        {JSONLD_META_KEY: details_jsonld(details, values, urls)})
+                       for details, values in rows)
+        return len(update_seo_meta(changes))
+    return process_media_batches(options, process)
+
+def main():
+    run_command(_script_name, _script_description, rebuild, options=BATCH_OPTIONS)
+
+if __name__ == '__main__':
+    main()
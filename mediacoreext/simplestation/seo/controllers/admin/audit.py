@@ -0,0 +1,38 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from pylons import response
+
+from mediacore.lib.auth import has_permission
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import expose
+
+from mediacoreext.simplestation.seo.controllers.sitemaps import stream_from_db
+from mediacoreext.simplestation.seo.lib.audit import (audit_rows, csv_lines,
+    ISSUES, load_audit_summary, SEOAudit)
+
+def _audit_lines(connection):
+    return csv_lines(SEOAudit().run(audit_rows(connection)))
+
+class AuditController(BaseController):
+    allow_only = has_permission('admin')
+
+    @expose('seo/admin/audit.html')
+    def index(self, **kwargs):
+        """Display the summary of the last audit run by mediacore-seo-audit."""
+        return dict(
+            summary=load_audit_summary(),
+            issues=ISSUES,
+        )
+
+    @expose()
+    def csv(self, **kwargs):
+        """Stream a fresh audit of all media as CSV."""
+        response.content_type = 'text/csv'
+        response.headers['Content-Disposition'] = \
+            'attachment; filename="seo-audit.csv"'
+        return stream_from_db(_audit_lines)
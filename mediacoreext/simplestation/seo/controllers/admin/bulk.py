@@ -0,0 +1,63 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from mediacore.lib.auth import has_permission
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import autocommit, expose, validate
+from mediacore.lib.helpers import url_for
+from mediacore.lib.i18n import _
+
+from mediacoreext.simplestation.seo.lib.bulk_edit import bulk_edit, parse_ids
+from mediacoreext.simplestation.seo.lib.cdn import media_key, queue_purge
+from mediacoreext.simplestation.seo.lib.keywords import split_keywords
+from mediacoreext.simplestation.seo.lib.lazy import LazyForm
+from mediacoreext.simplestation.seo.lib.resolver import forget_media_head
+
+seo_bulk_edit_form = LazyForm('mediacoreext.simplestation.seo.forms.admin.bulk:SEOBulkEditForm')
+
+class BulkController(BaseController):
+    allow_only = has_permission('admin')
+
+    @expose('seo/admin/bulk.html')
+    def index(self, ids=None, message=None, **kwargs):
+        """Display the bulk edit form.
+
+        :param ids: Preselected media ids, so that a selection from the
+            media list can be passed in the query string.
+
+        """
+        values = kwargs.get('bulk') or {}
+        if ids and not values.get('media_ids'):
+            values = dict(values, media_ids=u', '.join(map(unicode, parse_ids(ids))))
+        return dict(
+            form=seo_bulk_edit_form,
+            form_action=url_for(action='save'),
+            form_values=dict(bulk=values),
+            message=message,
+        )
+
+    @expose('seo/admin/bulk.html')
+    @validate(seo_bulk_edit_form, error_handler=index)
+    @autocommit
+    def save(self, bulk, **kwargs):
+        """Apply the changes to all selected media in one transaction."""
+        dry_run = bool(bulk.get('dry_run'))
+        changed_ids = bulk_edit(parse_ids(bulk['media_ids']),
+            title_template=bulk.get('page_title'),
+            description=bulk.get('meta_description'),
+            add_keywords=split_keywords(bulk.get('add_keywords')),
+            remove_keywords=split_keywords(bulk.get('remove_keywords')),
+            dry_run=dry_run,
+        )
+        if dry_run:
+            message = _('%d media items would be changed.', domain='mediacore_seo')
+        else:
+            for media_id in changed_ids:
+                forget_media_head(media_id)
+            queue_purge([media_key(media_id) for media_id in changed_ids])
+            message = _('%d media items were changed.', domain='mediacore_seo')
+        return self.index(message=message % len(changed_ids), bulk=bulk)
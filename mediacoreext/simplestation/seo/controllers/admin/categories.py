@@ -0,0 +1,59 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from mediacore.lib.auth import has_permission
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import autocommit, expose, validate
+from mediacore.lib.helpers import redirect, url_for
+from mediacore.model import Category, fetch_row
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.lib.categories import (fetch_category_seo,
+    save_category_seo)
+from mediacoreext.simplestation.seo.lib.cdn import page_key, queue_purge
+from mediacoreext.simplestation.seo.lib.lazy import LazyForm
+from mediacoreext.simplestation.seo.lib.resolver import reset_seo_profile
+
+seo_category_form = LazyForm('mediacoreext.simplestation.seo.forms.admin.categories:SEOCategoryForm')
+
+def _noindex_option(value):
+    if value is None:
+        return ''
+    return value and '1' or '0'
+
+class CategoriesController(BaseController):
+    allow_only = has_permission('admin')
+
+    @expose('seo/admin/categories.html')
+    def index(self, id=None, **kwargs):
+        """List all categories and edit the SEO values of the selected one."""
+        category = id and fetch_row(Category, id) or None
+        values = kwargs.get('seo')
+        if category is not None and values is None:
+            stored = fetch_category_seo(DBSession.connection(), category.id)
+            values = stored.get(category.id) or {}
+            values = dict(values, noindex=_noindex_option(values.get('noindex')))
+        return dict(
+            categories=Category.query.order_by(Category.name).all(),
+            category=category,
+            form=seo_category_form,
+            form_action=category and url_for(action='save', id=category.id),
+            form_values=dict(seo=values or {}),
+        )
+
+    @expose()
+    @validate(seo_category_form, error_handler=index)
+    @autocommit
+    def save(self, id, seo, **kwargs):
+        category = fetch_row(Category, id)
+        noindex = {'1': True, '0': False}.get(seo.get('noindex'))
+        values = dict(seo, noindex=noindex)
+        save_category_seo(DBSession.connection(), category.id, values)
+        # child categories inherit the values, so purge all category pages
+        queue_purge([page_key('category')])
+        reset_seo_profile()
+        redirect(action='index', id=category.id)
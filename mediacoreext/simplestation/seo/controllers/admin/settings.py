@@ -9,13 +9,29 @@ from mediacore.lib.base import BaseSettingsController
 from mediacore.lib.decorators import autocommit, expose, validate
 from mediacore.lib.helpers import url_for
 
-from mediacoreext.simplestation.seo.forms.admin.settings import SEOSettingsForm
+from mediacoreext.simplestation.seo.lib.cdn import queue_purge, SETTINGS_KEY
+from mediacoreext.simplestation.seo.lib.indexnow import queue_ping
+from mediacoreext.simplestation.seo.lib.lazy import LazyForm
+from mediacoreext.simplestation.seo.lib.locales import (configured_locales,
+    locale_fieldset_name, localized_key)
+from mediacoreext.simplestation.seo.lib.resolver import reset_seo_profile
+from mediacoreext.simplestation.seo.lib.settings_cache import (bump_settings_version,
+    fetch_settings, LOCALIZED_SETTING_KEYS, save_settings)
 
-seo_settings_form = SEOSettingsForm()
+seo_settings_form = LazyForm('mediacoreext.simplestation.seo.forms.admin.settings:SEOSettingsForm')
 
 class SettingsController(BaseSettingsController):
     @expose('seo/admin/settings.html')
     def index(self, **kwargs):
+        # The locale specific settings are not created by a migration, so
+        # BaseSettingsController does not know them.
+        locales = configured_locales()
+        if locales:
+            stored = fetch_settings()
+            for locale in locales:
+                keys = [localized_key(key, locale) for key in LOCALIZED_SETTING_KEYS]
+                kwargs.setdefault(locale_fieldset_name(locale),
+                                  dict((key, stored.get(key)) for key in keys))
         return self._display(form=seo_settings_form,
                              action=url_for(action='save'),
                              values=kwargs)
@@ -24,4 +40,23 @@ class SettingsController(BaseSettingsController):
     @validate(seo_settings_form, error_handler=index)
     @autocommit
     def save(self, **kwargs):
-        self._save(seo_settings_form, 'index', values=kwargs)
+        bump_settings_version()
+        localized = {}
+        for locale in configured_locales():
+            localized.update(kwargs.get(locale_fieldset_name(locale)) or {})
+        if localized:
+            save_settings(localized)
+        # every page tagged by the plugin carries the settings key
+        queue_purge([SETTINGS_KEY])
+        # the settings change titles and descriptions of these pages
+        queue_ping([
+            url_for(controller='/media', action='explore', qualified=True),
+            url_for(controller='/podcasts', action='index', qualified=True),
+            url_for(controller='/categories', action='index', qualified=True),
+        ])
+        try:
+            self._save(seo_settings_form, 'index', values=kwargs)
+        finally:
+            # _save() redirects by raising. Other workers notice the new
+            # version, this one rebuilds its profile on the next request.
+            reset_seo_profile()
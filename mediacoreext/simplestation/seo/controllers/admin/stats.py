@@ -0,0 +1,42 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from webob.exc import HTTPNotFound
+
+from mediacore.lib.auth import has_permission
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import expose
+
+from mediacoreext.simplestation.seo.lib.instrumentation import (get_observer_stats,
+    instrumentation_enabled)
+from mediacoreext.simplestation.seo.lib.resolver import (get_head_cache,
+    get_related_cache)
+
+class StatsController(BaseController):
+    allow_only = has_permission('admin')
+
+    @expose('seo/admin/stats.html')
+    def index(self, **kwargs):
+        """Display the observer statistics of the current worker process."""
+        if not instrumentation_enabled():
+            raise HTTPNotFound()
+        stats = get_observer_stats().snapshot()
+        return dict(
+            stats=stats,
+            observers=sorted(stats['observers'].iteritems()),
+            head_cache=get_head_cache().stats(),
+            related_cache=get_related_cache().stats(),
+        )
+
+    @expose('json')
+    def json(self, **kwargs):
+        """Return the observer statistics as JSON."""
+        if not instrumentation_enabled():
+            raise HTTPNotFound()
+        return dict(get_observer_stats().snapshot(),
+                    head_cache=get_head_cache().stats(),
+                    related_cache=get_related_cache().stats())
@@ -0,0 +1,22 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from pylons import config, response
+from webob.exc import HTTPNotFound
+
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import expose
+
+class IndexnowController(BaseController):
+    @expose()
+    def key(self, **kwargs):
+        """Serve the IndexNow key so search engines can verify our pings."""
+        key = config.get('seo.indexnow_key')
+        if not key:
+            raise HTTPNotFound()
+        response.content_type = 'text/plain'
+        return key
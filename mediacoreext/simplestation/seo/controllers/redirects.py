@@ -0,0 +1,27 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from pylons import request
+from webob.exc import HTTPMovedPermanently
+
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import expose
+from mediacore.lib.helpers import url_for
+
+class RedirectsController(BaseController):
+    @expose()
+    def follow(self, target, **kwargs):
+        """Permanently redirect an old URL of a renamed media item.
+
+        The route only matches paths found in the redirect index, which
+        passes the new path as ``target``.
+
+        """
+        location = url_for(target, qualified=True)
+        if request.query_string:
+            location += '?' + request.query_string
+        raise HTTPMovedPermanently(location=location)
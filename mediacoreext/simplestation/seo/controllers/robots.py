@@ -0,0 +1,26 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from pylons import response
+
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import expose
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.lib.cdn import (page_key, SETTINGS_KEY,
+    tag_response)
+from mediacoreext.simplestation.seo.lib.robots import get_robots_txt
+
+class RobotsController(BaseController):
+    @expose()
+    def index(self, **kwargs):
+        """Serve robots.txt generated from the noindex options."""
+        response.content_type = 'text/plain'
+        response.charset = 'utf-8'
+        # the category noindex flags are part of it
+        tag_response([page_key('category'), SETTINGS_KEY])
+        return get_robots_txt(DBSession.connection())
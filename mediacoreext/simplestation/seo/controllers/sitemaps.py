@@ -0,0 +1,107 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+import os
+
+from paste.fileapp import FileApp
+from pylons import response
+from pylons.controllers.util import forward
+from webob.exc import HTTPNotFound
+
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import expose
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.lib.resolver import get_seo_profile
+from mediacoreext.simplestation.seo.lib.sitemap import (category_entries,
+    count_media_shards, media_shard_entries, render_sitemap_index,
+    render_urlset, sitemap_urls)
+from mediacoreext.simplestation.seo.lib.sitemap_files import get_sitemap_snapshot
+
+def stream_from_db(entries_func, *args):
+    """Run the given entry generator on a connection of its own.
+
+    The request's session is closed before the response body is
+    consumed, hence the separate connection.
+
+    """
+    engine = DBSession.bind
+    def generate():
+        connection = engine.connect()
+        try:
+            for entry in entries_func(connection, *args):
+                yield entry
+        finally:
+            connection.close()
+    return generate()
+
+def serve_file(path, content_type):
+    """Serve a prebuilt sitemap file.
+
+    FileApp sends ETag and Last-Modified headers and answers conditional
+    requests with 304 Not Modified.
+
+    """
+    if not os.path.exists(path):
+        raise HTTPNotFound()
+    return forward(FileApp(path, content_type=content_type))
+
+
+class SitemapsController(BaseController):
+    @expose()
+    def index(self, **kwargs):
+        """Display the sitemap index listing all sitemap shards.
+
+        If prebuilt sitemaps exist in ``seo.sitemap_dir`` their index is
+        served instead of querying the database.
+
+        """
+        snapshot = get_sitemap_snapshot()
+        if snapshot is not None and os.path.exists(snapshot.index_path):
+            return serve_file(snapshot.index_path, 'application/xml')
+
+        urls = sitemap_urls()
+        shards = count_media_shards(DBSession.connection())
+        locs = [urls['shard'](shard) for shard in range(shards)]
+        if not get_seo_profile().noindex_categories:
+            locs.append(urls['shard']('categories'))
+        response.content_type = 'application/xml'
+        return render_sitemap_index(locs)
+
+    @expose()
+    def shard(self, id, **kwargs):
+        """Stream one sitemap shard with up to 50.000 URLs."""
+        urls = sitemap_urls()
+        if id == 'categories':
+            profile = get_seo_profile()
+            if profile.noindex_categories:
+                raise HTTPNotFound()
+            # resolves all categories now, the request's session is closed
+            # before the body is streamed
+            profile.resolve_category(None)
+            indexed = lambda category_id: profile.resolve_category(category_id)['robots']
+            body = render_urlset(stream_from_db(category_entries, indexed),
+                                 urls['category'])
+        else:
+            try:
+                shard = int(id)
+            except ValueError:
+                raise HTTPNotFound()
+            if shard < 0:
+                raise HTTPNotFound()
+            body = render_urlset(stream_from_db(media_shard_entries, shard),
+                                 urls['media'], urls['thumb'])
+        response.content_type = 'application/xml'
+        return body
+
+    @expose()
+    def snapshot(self, id, **kwargs):
+        """Serve a prebuilt, gzip-compressed sitemap shard."""
+        snapshot = get_sitemap_snapshot()
+        if snapshot is None or not (id.isdigit() or id == 'categories'):
+            raise HTTPNotFound()
+        return serve_file(snapshot.shard_path(id), 'application/x-gzip')
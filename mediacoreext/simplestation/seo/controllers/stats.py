@@ -0,0 +1,33 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from pylons import config
+from webob.exc import HTTPNotFound
+
+from mediacore.lib.base import BaseController
+from mediacore.lib.decorators import expose
+
+from mediacoreext.simplestation.seo.lib.instrumentation import (get_observer_stats,
+    instrumentation_enabled)
+from mediacoreext.simplestation.seo.lib.resolver import (get_head_cache,
+    get_related_cache)
+
+class StatsController(BaseController):
+    @expose('json')
+    def index(self, token=None, **kwargs):
+        """Return the observer statistics as JSON for monitoring systems.
+
+        Unlike the admin page this does not need a login but the token
+        configured as ``seo.instrumentation_token`` must be passed.
+
+        """
+        expected_token = config.get('seo.instrumentation_token')
+        if not (instrumentation_enabled() and expected_token and token == expected_token):
+            raise HTTPNotFound()
+        return dict(get_observer_stats().snapshot(),
+                    head_cache=get_head_cache().stats(),
+                    related_cache=get_related_cache().stats())
@@ -0,0 +1,61 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from tw.forms import CheckBox
+from tw.forms.validators import Bool, NotEmpty
+
+from mediacore.forms import ListFieldSet, ListForm, SubmitButton, TextArea, TextField
+from mediacore.lib.i18n import N_
+
+from mediacoreext.simplestation.seo.forms.admin.settings import TemplateValidator
+
+MEDIA_TEMPLATE_HELP_TEXT = N_('Placeholders: {media.title}, {media.author}, {media.description}', domain='mediacore_seo')
+
+class SEOBulkEditForm(ListForm):
+    template = 'admin/box-form.html'
+    id = 'bulk-form'
+    css_class = 'form'
+    submit_text = None
+    fields = [
+        ListFieldSet('bulk', suppress_label=True, legend=N_('Bulk Edit', domain='mediacore_seo'),
+            css_classes=['details_fieldset'],
+            children=[
+                TextArea('media_ids',
+                    label_text=N_('Media IDs', domain='mediacore_seo'),
+                    help_text=N_('(Comma Separated)', domain='mediacore_seo'),
+                    validator=NotEmpty,
+                    attrs=dict(rows=3, cols=40),
+                ),
+                TextField('page_title',
+                    label_text=N_('Page Title', domain='mediacore_seo'),
+                    help_text=MEDIA_TEMPLATE_HELP_TEXT,
+                    validator=TemplateValidator,
+                ),
+                TextField('meta_description',
+                    label_text=N_('Meta Description', domain='mediacore_seo'),
+                    help_text=MEDIA_TEMPLATE_HELP_TEXT,
+                    validator=TemplateValidator,
+                ),
+                TextField('add_keywords',
+                    label_text=N_('Add Meta Keywords', domain='mediacore_seo'),
+                    help_text=N_('(Comma Separated)', domain='mediacore_seo'),
+                ),
+                TextField('remove_keywords',
+                    label_text=N_('Remove Meta Keywords', domain='mediacore_seo'),
+                    help_text=N_('(Comma Separated)', domain='mediacore_seo'),
+                ),
+                CheckBox('dry_run',
+                    label_text=N_('Preview Only', domain='mediacore_seo'),
+                    help_text=N_('Count the media items which would change', domain='mediacore_seo'),
+                    validator=Bool(if_missing=''),
+                ),
+            ],
+        ),
+        SubmitButton('save', default=N_('Apply', domain='mediacore_seo'), named_button=True,
+            suppress_label=True, css_classes=['btn', 'btn-save']
+        ),
+    ]
@@ -0,0 +1,52 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from mediacore.forms import (ListFieldSet, ListForm, SingleSelectField,
+    SubmitButton, TextField)
+from mediacore.lib.i18n import N_
+
+from mediacoreext.simplestation.seo.forms.admin.settings import (
+    TEMPLATE_HELP_TEXT, TemplateValidator)
+
+NOINDEX_OPTIONS = [
+    ('', N_('Inherit from parent', domain='mediacore_seo')),
+    ('1', N_('Yes', domain='mediacore_seo')),
+    ('0', N_('No', domain='mediacore_seo')),
+]
+
+class SEOCategoryForm(ListForm):
+    template = 'admin/box-form.html'
+    id = 'category-seo-form'
+    css_class = 'form'
+    submit_text = None
+    fields = [
+        ListFieldSet('seo', suppress_label=True, legend=N_('Category SEO', domain='mediacore_seo'),
+            css_classes=['details_fieldset'],
+            children=[
+                TextField('page_title',
+                    label_text=N_('Page Title', domain='mediacore_seo'),
+                    help_text=TEMPLATE_HELP_TEXT,
+                    validator=TemplateValidator,
+                ),
+                TextField('meta_description',
+                    label_text=N_('Meta Description', domain='mediacore_seo'),
+                    validator=TemplateValidator,
+                ),
+                TextField('meta_keywords',
+                    label_text=N_('Meta Keywords', domain='mediacore_seo'),
+                    help_text=N_('(Comma Separated)', domain='mediacore_seo'),
+                ),
+                SingleSelectField('noindex',
+                    label_text=N_('Enable NOINDEX', domain='mediacore_seo'),
+                    options=NOINDEX_OPTIONS,
+                ),
+            ],
+        ),
+        SubmitButton('save', default=N_('Save', domain='mediacore_seo'), named_button=True,
+            suppress_label=True, css_classes=['btn', 'btn-save']
+        ),
+    ]
@@ -5,12 +5,65 @@
 # (at your option) any later version.
 # See LICENSE.txt in the main project directory, for more information.
 
+from formencode import Invalid
+from formencode.api import FancyValidator
 from tw.forms import CheckBox, HiddenField
 from tw.forms.validators import Bool
 
 from mediacore.forms import ListFieldSet, ListForm, SubmitButton, TextField
 from mediacore.lib.i18n import N_
 
+from mediacoreext.simplestation.seo.lib.locales import (configured_locales,
+    locale_fieldset_name, localized_key)
+from mediacoreext.simplestation.seo.lib.text_templates import (compile_template,
+    TemplateError)
+
+TEMPLATE_HELP_TEXT = N_('Placeholders: {media.title}, {media.author}, {category.name}', domain='mediacore_seo')
+
+class TemplateValidator(FancyValidator):
+    """Reject titles and descriptions with unknown placeholders."""
+
+    def validate_python(self, value, state):
+        try:
+            compile_template(value)
+        except TemplateError as e:
+            raise Invalid(unicode(e), value, state)
+
+# (setting key, label, is a template) of the fields repeated per locale
+LOCALIZED_FIELDS = (
+    (u'seo_general_meta_description', N_('Site Meta Description', domain='mediacore_seo'), True),
+    (u'seo_general_meta_keywords', N_('Site Meta Keywords', domain='mediacore_seo'), False),
+    (u'seo_explore_page_title', N_('Explore Page Title', domain='mediacore_seo'), True),
+    (u'seo_explore_meta_description', N_('Explore Meta Description', domain='mediacore_seo'), True),
+    (u'seo_explore_meta_keywords', N_('Explore Meta Keywords', domain='mediacore_seo'), False),
+    (u'seo_podcast_page_title', N_('Podcast Page Title', domain='mediacore_seo'), True),
+    (u'seo_podcast_meta_description', N_('Podcast Meta Description', domain='mediacore_seo'), True),
+    (u'seo_podcast_meta_keywords', N_('Podcast Meta Keywords', domain='mediacore_seo'), False),
+    (u'seo_category_page_title', N_('Category Page Title', domain='mediacore_seo'), True),
+    (u'seo_category_meta_description', N_('Category Meta Description', domain='mediacore_seo'), True),
+    (u'seo_category_meta_keywords', N_('Category Meta Keywords', domain='mediacore_seo'), False),
+    (u'seo_upload_page_title', N_('Upload Page Title', domain='mediacore_seo'), True),
+    (u'seo_upload_meta_description', N_('Upload Meta Description', domain='mediacore_seo'), True),
+    (u'seo_upload_meta_keywords', N_('Upload Meta Keywords', domain='mediacore_seo'), False),
+)
+
+def localized_fieldset(locale):
+    """Return the fieldset with the settings of one locale.
+
+    Empty fields fall back to the regular value of the same field.
+
+    """
+    children = []
+    for key, label, is_template in LOCALIZED_FIELDS:
+        if is_template:
+            field = TextField(localized_key(key, locale), label_text=label,
+                              validator=TemplateValidator)
+        else:
+            field = TextField(localized_key(key, locale), label_text=label)
+        children.append(field)
+    return ListFieldSet(locale_fieldset_name(locale), suppress_label=True,
+        legend=locale, css_classes=['details_fieldset'], children=children)
+
 class SEOSettingsForm(ListForm):
     template = 'admin/box-form.html'
     id = 'settings-form'
@@ -22,6 +75,8 @@ class SEOSettingsForm(ListForm):
             children=[
                 TextField('seo_general_meta_description',
                     label_text=N_('Site Meta Description', domain='mediacore_seo'),
+                    help_text=TEMPLATE_HELP_TEXT,
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_general_meta_keywords',
                     label_text=N_('Site Meta Keywords', domain='mediacore_seo'),
@@ -34,9 +89,12 @@ class SEOSettingsForm(ListForm):
             children=[
                 TextField('seo_explore_page_title',
                     label_text=N_('Page Title', domain='mediacore_seo'),
+                    help_text=TEMPLATE_HELP_TEXT,
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_explore_meta_description',
                     label_text=N_('Meta Description', domain='mediacore_seo'),
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_explore_meta_keywords',
                     label_text=N_('Meta Keywords', domain='mediacore_seo'),
@@ -49,9 +107,12 @@ class SEOSettingsForm(ListForm):
             children=[
                 TextField('seo_podcast_page_title',
                     label_text=N_('Page Title', domain='mediacore_seo'),
+                    help_text=TEMPLATE_HELP_TEXT,
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_podcast_meta_description',
                     label_text=N_('Meta Description', domain='mediacore_seo'),
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_podcast_meta_keywords',
                     label_text=N_('Meta Keywords', domain='mediacore_seo'),
@@ -64,9 +125,12 @@ class SEOSettingsForm(ListForm):
             children=[
                 TextField('seo_category_page_title',
                     label_text=N_('Page Title', domain='mediacore_seo'),
+                    help_text=TEMPLATE_HELP_TEXT,
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_category_meta_description',
                     label_text=N_('Meta Description', domain='mediacore_seo'),
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_category_meta_keywords',
                     label_text=N_('Meta Keywords', domain='mediacore_seo'),
@@ -79,9 +143,12 @@ class SEOSettingsForm(ListForm):
             children=[
                 TextField('seo_upload_page_title',
                     label_text=N_('Page Title', domain='mediacore_seo'),
+                    help_text=TEMPLATE_HELP_TEXT,
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_upload_meta_description',
                     label_text=N_('Meta Description', domain='mediacore_seo'),
+                    validator=TemplateValidator,
                 ),
                 TextField('seo_upload_meta_keywords',
                     label_text=N_('Meta Keywords', domain='mediacore_seo'),
@@ -100,13 +167,23 @@ class SEOSettingsForm(ListForm):
                     label_text=N_('Enable NOINDEX for RSS', domain='mediacore_seo'),
                     validator=Bool(if_missing=''),
                 ),
+                CheckBox('seo_options_auto_fallbacks',
+                    label_text=N_('Generate Media Meta Data', domain='mediacore_seo'),
+                    help_text=N_('Derived from title, description and tags on save', domain='mediacore_seo'),
+                    validator=Bool(if_missing=''),
+                ),
                 # XXX: Argh toscawidgets will mark the fieldset as invalid (missing)
                 #      when neither of the above checkboxes are checked, unless
                 #      we ensure some 'options' value is always passed.
                 HiddenField('dummy_field', default='1'),
             ],
         ),
-        SubmitButton('save', default=N_('Save', domain='mediacore_seo'), named_button=True,
-            suppress_label=True, css_classes=['btn', 'btn-save']
-        ),
     ]
+
+    def post_init(self, *args, **kwargs):
+        # The locales are only known once the config is loaded, the save
+        # button has to come after their fieldsets.
+        for locale in configured_locales():
+            self.children.append(localized_fieldset(locale))
+        self.children.append(SubmitButton('save', default=N_('Save', domain='mediacore_seo'),
+            named_button=True, suppress_label=True, css_classes=['btn', 'btn-save']))
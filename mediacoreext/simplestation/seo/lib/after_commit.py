@@ -0,0 +1,71 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Hand items to a background queue only once the transaction committed.
+
+Notifying other systems about a change (search engines, a CDN, the sitemap
+builder) before the change is committed announces saves which are rolled
+back later and lets them see uncommitted rows. An :class:`AfterCommitBuffer`
+collects the items of the current thread's transaction instead;
+:func:`send_after_commit` and :func:`discard_after_rollback` are connected
+to the session events by the plugin.
+"""
+
+import threading
+
+__all__ = [
+    'AfterCommitBuffer',
+    'discard_after_rollback',
+    'send_after_commit',
+]
+
+_buffers = []
+
+
+class AfterCommitBuffer(object):
+    """Items collected per thread until the transaction ends.
+
+    :param get_queue: A callable returning an object with an ``add(items)``
+        method or None if the feature is disabled, evaluated on commit.
+
+    """
+
+    def __init__(self, get_queue):
+        self.get_queue = get_queue
+        self._local = threading.local()
+        _buffers.append(self)
+
+    def add(self, items):
+        """Pass the items on once the current transaction is committed."""
+        pending = getattr(self._local, 'items', None)
+        if pending is None:
+            pending = self._local.items = set()
+        pending.update(items)
+
+    def pending(self):
+        return getattr(self._local, 'items', None) or set()
+
+    def send(self):
+        items = self.pending()
+        self._local.items = None
+        if items:
+            queue = self.get_queue()
+            if queue is not None:
+                queue.add(items)
+
+    def discard(self):
+        self._local.items = None
+
+
+def send_after_commit(session=None):
+    """Listener for the ``after_commit`` session event."""
+    for buffer in _buffers:
+        buffer.send()
+
+def discard_after_rollback(session=None, *args):
+    """Listener for the ``after_rollback`` session event."""
+    for buffer in _buffers:
+        buffer.discard()
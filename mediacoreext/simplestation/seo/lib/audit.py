@@ -0,0 +1,161 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""SEO audit of the whole media catalogue.
+
+All media and their ``seo_*`` meta are read in a single query through a
+server-side cursor and checked one row at a time. Issues are yielded as
+soon as they are found, so reports can be written incrementally. The only
+state kept is a short hash per distinct description for the duplicate
+check.
+"""
+
+import csv
+import hashlib
+import json
+from cStringIO import StringIO
+from datetime import datetime
+
+from sqlalchemy import and_, select
+
+from mediacore.model.media import media, media_meta
+from mediacore.model.meta import DBSession
+from mediacore.model.settings import Setting
+
+from mediacoreext.simplestation.seo.lib.fallbacks import DESCRIPTION_LENGTH
+from mediacoreext.simplestation.seo.lib.text_templates import TITLE_LENGTH
+
+__all__ = [
+    'audit_rows',
+    'AUDIT_SUMMARY_KEY',
+    'csv_lines',
+    'description_hash',
+    'ISSUES',
+    'load_audit_summary',
+    'save_audit_summary',
+    'SEOAudit',
+]
+
+AUDIT_SUMMARY_KEY = u'seo_audit_summary'
+
+ISSUES = (
+    'missing_title',
+    'missing_description',
+    'title_too_long',
+    'description_too_long',
+    'duplicate_description',
+)
+
+CSV_HEADER = ('media_id', 'slug', 'issue', 'detail')
+
+def audit_rows(connection):
+    """Yield ``(id, slug, title, page_title, meta_description,
+    auto_meta_description)`` for all media, ordered by id."""
+    keys = (u'seo_page_title', u'seo_meta_description',
+            u'seo_auto_meta_description')
+    aliases = [media_meta.alias('audit_%d' % i) for i in range(len(keys))]
+    joined = media
+    for key, alias in zip(keys, aliases):
+        joined = joined.outerjoin(alias, and_(alias.c.media_id == media.c.id,
+                                              alias.c.key == key))
+    query = select([media.c.id, media.c.slug, media.c.title] +
+                   [alias.c.value for alias in aliases],
+                   from_obj=[joined]).\
+        order_by(media.c.id)
+    return connection.execution_options(stream_results=True).execute(query)
+
+def description_hash(text):
+    """Return a short hash of a description, ignoring case and whitespace."""
+    normalized = u' '.join(text.lower().split())
+    return hashlib.md5(normalized.encode('utf-8')).digest()[:8]
+
+
+class SEOAudit(object):
+    """Checks media rows and counts the issues found.
+
+    :param title_length: Maximum length of a page title.
+    :param description_length: Maximum length of a meta description.
+
+    """
+
+    def __init__(self, title_length=TITLE_LENGTH,
+                 description_length=DESCRIPTION_LENGTH):
+        self.title_length = title_length
+        self.description_length = description_length
+        self.media = 0
+        self.counts = dict.fromkeys(ISSUES, 0)
+        self._descriptions = {}
+
+    def check(self, row):
+        """Return a list of ``(issue, detail)`` tuples for one media row."""
+        id, slug, title, page_title, meta_description, auto_description = row
+        issues = []
+        if not page_title:
+            issues.append(('missing_title', u''))
+        title = page_title or title or u''
+        if len(title) > self.title_length:
+            issues.append(('title_too_long', unicode(len(title))))
+        description = meta_description or auto_description
+        if not description:
+            issues.append(('missing_description', u''))
+        else:
+            if len(description) > self.description_length:
+                issues.append(('description_too_long', unicode(len(description))))
+            first_id = self._descriptions.setdefault(description_hash(description), id)
+            if first_id != id:
+                issues.append(('duplicate_description', unicode(first_id)))
+        return issues
+
+    def run(self, rows):
+        """Yield ``(media_id, slug, issue, detail)`` for all rows."""
+        for row in rows:
+            self.media += 1
+            for issue, detail in self.check(row):
+                self.counts[issue] += 1
+                yield row[0], row[1], issue, detail
+
+    def summary(self):
+        return {
+            'media': self.media,
+            'issues': dict(self.counts),
+            'created_on': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+
+def csv_lines(issues, header=True):
+    """Yield the issues as UTF-8 encoded CSV lines.
+
+    The header line comes first, even if there are no issues at all.
+
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_HEADER)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    for media_id, slug, issue, detail in issues:
+        writer.writerow((media_id, (slug or u'').encode('utf-8'), issue,
+                         detail.encode('utf-8')))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def save_audit_summary(summary):
+    """Store the summary of the last audit for the admin report."""
+    setting = Setting.query.filter(Setting.key == AUDIT_SUMMARY_KEY).first()
+    if setting is None:
+        setting = Setting(AUDIT_SUMMARY_KEY, u'')
+        DBSession.add(setting)
+    setting.value = unicode(json.dumps(summary))
+
+def load_audit_summary():
+    """Return the summary of the last audit or None."""
+    value = DBSession.query(Setting.value).\
+        filter(Setting.key == AUDIT_SUMMARY_KEY).\
+        scalar()
+    return value and json.loads(value) or None
@@ -0,0 +1,52 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Helpers for queries over many rows.
+
+Only SQLAlchemy is used here, no MediaCore models, so the migrations can
+use these helpers with their own table definitions.
+"""
+
+from sqlalchemy import select
+
+__all__ = [
+    'chunks',
+    'id_batches',
+    'IN_CLAUSE_CHUNK_SIZE',
+]
+
+# Keep the IN (...) clause well below the bind parameter limits of
+# SQLite and friends.
+IN_CLAUSE_CHUNK_SIZE = 500
+
+def chunks(values, size=IN_CLAUSE_CHUNK_SIZE):
+    """Yield lists of at most ``size`` of the given values."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start+size]
+
+def id_batches(execute, id_column, after_id=0, batch_size=1000):
+    """Walk a table by primary key in ascending order.
+
+    Yields lists of up to ``batch_size`` ids greater than ``after_id``.
+    Each list is selected only when it is needed, so the caller may commit
+    between two batches and an interrupted run can continue after the
+    last id it processed.
+
+    :param execute: A callable running a query, e.g. ``DBSession.execute``
+        or ``connection.execute``.
+    :param id_column: The primary key column, e.g. ``media.c.id``.
+
+    """
+    while True:
+        query = select([id_column], id_column > after_id).\
+            order_by(id_column).\
+            limit(batch_size)
+        ids = [id for id, in execute(query)]
+        if not ids:
+            return
+        yield ids
+        after_id = ids[-1]
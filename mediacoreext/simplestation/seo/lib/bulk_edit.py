@@ -0,0 +1,93 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+import re
+
+from sqlalchemy import select
+
+from mediacore.model.media import media
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.lib.keywords import split_keywords
+from mediacoreext.simplestation.seo.lib.batches import chunks
+from mediacoreext.simplestation.seo.lib.fallbacks import DESCRIPTION_LENGTH
+from mediacoreext.simplestation.seo.lib.media_meta import (fetch_seo_meta,
+    update_seo_meta)
+from mediacoreext.simplestation.seo.lib.text_templates import (compile_template,
+    TextTemplate)
+
+__all__ = [
+    'bulk_edit',
+    'parse_ids',
+]
+
+_ids_re = re.compile(r'\d+')
+
+def parse_ids(value):
+    """Return the list of media ids in a comma or space separated string."""
+    return sorted(set(int(id) for id in _ids_re.findall(value or '')))
+
+def _edit_keywords(value, add, remove):
+    keywords = split_keywords(value)
+    remove = set(keyword.lower() for keyword in remove)
+    keywords = [keyword for keyword in keywords if keyword.lower() not in remove]
+    present = set(keyword.lower() for keyword in keywords)
+    for keyword in add:
+        if keyword.lower() not in present:
+            present.add(keyword.lower())
+            keywords.append(keyword)
+    return u', '.join(keywords) or None
+
+def _media_rows(media_ids):
+    # rows have the attributes used by the media placeholders
+    rows = {}
+    for chunk in chunks(media_ids):
+        query = select([media.c.id, media.c.title, media.c.author_name,
+                        media.c.description_plain], media.c.id.in_(chunk))
+        rows.update((row.id, row) for row in DBSession.execute(query))
+    return rows
+
+def _render(template, item):
+    if isinstance(template, TextTemplate):
+        return template.render(media=item)
+    return template
+
+def bulk_edit(media_ids, title_template=None, description=None,
+              add_keywords=(), remove_keywords=(), dry_run=False):
+    """Change the SEO meta of many media items with a few batched statements.
+
+    :param media_ids: The ids of the media items to change.
+    :param title_template: New page title, may contain media placeholders
+        like ``{media.title}``, see
+        :func:`~mediacoreext.simplestation.seo.lib.text_templates.compile_template`.
+    :param description: New meta description, may contain placeholders too.
+    :raises TemplateError: For invalid templates.
+    :param add_keywords: Keywords added to the meta keywords of each item.
+    :param remove_keywords: Keywords removed (case-insensitive) from them.
+    :param dry_run: Only count the media items which would be changed.
+    :returns: The ids of the media items which (would have) changed.
+    :rtype: list
+
+    """
+    title_template = compile_template(title_template)
+    description = compile_template(description, DESCRIPTION_LENGTH)
+    rows = _media_rows(media_ids)
+    media_ids = sorted(rows)
+    stored = fetch_seo_meta(media_ids)
+    changes = {}
+    for media_id in media_ids:
+        values = {}
+        if title_template:
+            values[u'seo_page_title'] = _render(title_template, rows[media_id])
+        if description:
+            values[u'seo_meta_description'] = _render(description, rows[media_id])
+        if add_keywords or remove_keywords:
+            old_keywords = stored[media_id].get(u'seo_meta_keywords', (None, None))[1]
+            values[u'seo_meta_keywords'] = \
+                _edit_keywords(old_keywords, add_keywords, remove_keywords)
+        changes[media_id] = values
+    return update_seo_meta(changes, dry_run=dry_run, stored=stored)
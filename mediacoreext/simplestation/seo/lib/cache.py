@@ -0,0 +1,166 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+import cPickle as pickle
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+__all__ = [
+    'backend_from_config',
+    'FileBackend',
+    'LRUCache',
+    'MemcacheBackend',
+    'MemoryBackend',
+]
+
+
+class MemoryBackend(object):
+    """Cache backend storing values in a dict local to the process."""
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value):
+        self._data[key] = value
+
+
+class MemcacheBackend(object):
+    """Cache backend for memcached (or anything speaking its client API).
+
+    :param servers: A list of 'host:port' strings for python-memcached.
+    :param client: Optional object with memcache-style ``get``/``set``
+        methods which is used instead of creating a new client.
+
+    """
+
+    def __init__(self, servers=None, client=None, prefix='mediacore_seo.'):
+        if client is None:
+            import memcache
+            client = memcache.Client(servers or ['127.0.0.1:11211'])
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value)
+
+
+class FileBackend(object):
+    """Cache backend storing pickled values in a local directory.
+
+    Files are written to a temporary name first and renamed into place so
+    that readers in other processes never see partial data.
+
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.md5(key).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as fp:
+                return pickle.load(fp)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump(value, fp, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, self._path(key))
+
+
+class LRUCache(object):
+    """A thread-safe dict with a bounded size, dropping the oldest entries.
+
+    Entries can be stored with a revision, e.g. the modification date of
+    the object they were computed from. Looking them up with a different
+    revision counts as a miss, so the hit rate reflects usable entries.
+
+    :param max_size: The maximum number of entries kept.
+
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None, revision=None):
+        """Return the entry of ``key`` if it was stored with ``revision``.
+
+        An outdated entry is dropped.
+
+        """
+        with self._lock:
+            try:
+                stored_revision, value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if stored_revision != revision:
+                self.misses += 1
+                return default
+            self._data[key] = (stored_revision, value)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, revision=None):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (revision, value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Return a dict with the size and hit/miss counters of the cache."""
+        return {'size': len(self._data), 'max_size': self.max_size,
+                'hits': self.hits, 'misses': self.misses}
+
+
+def backend_from_config(config):
+    """Create the cache backend configured by ``seo.cache_backend``.
+
+    Supported values are 'memory' (the default), 'memcached:host:port[;...]'
+    and 'file:/path/to/directory'.
+
+    """
+    spec = config.get('seo.cache_backend', 'memory').strip()
+    name, _, arg = spec.partition(':')
+    if name == 'memory':
+        return MemoryBackend()
+    elif name == 'memcached':
+        return MemcacheBackend(servers=arg.split(';') if arg else None)
+    elif name == 'file':
+        return FileBackend(arg)
+    raise ValueError('Unknown seo.cache_backend %r' % spec)
@@ -0,0 +1,151 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""SEO values for single categories which are inherited by subcategories.
+
+Values which are not set for a category are taken from its parent, the
+top level categories inherit the values of the 'Category Page' settings.
+The whole tree is resolved at once into a flat category id -> values map,
+so rendering a category page is a single dict lookup.
+"""
+
+from sqlalchemy import (Boolean, Column, ForeignKey, Integer, Table,
+    UnicodeText, select)
+from sqlalchemy.orm.attributes import get_history
+
+from mediacore.model.categories import categories
+from mediacore.model.meta import metadata
+
+from mediacoreext.simplestation.seo.lib.fallbacks import DESCRIPTION_LENGTH
+from mediacoreext.simplestation.seo.lib.settings_cache import \
+    bump_settings_version_in
+from mediacoreext.simplestation.seo.lib.text_templates import (compile_value,
+    TITLE_LENGTH)
+
+__all__ = [
+    'bump_category_version',
+    'bump_category_version_on_update',
+    'category_seo',
+    'fetch_category_seo',
+    'load_category_pages',
+    'resolve_category_tree',
+    'save_category_seo',
+]
+
+category_seo = Table('seo_categories', metadata,
+    Column('category_id', Integer,
+        ForeignKey('categories.id', onupdate='CASCADE', ondelete='CASCADE'),
+        primary_key=True, autoincrement=False),
+    Column('page_title', UnicodeText),
+    Column('meta_description', UnicodeText),
+    Column('meta_keywords', UnicodeText),
+    # NULL means the flag is inherited from the parent category
+    Column('noindex', Boolean),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+
+CATEGORY_SEO_FIELDS = ('page_title', 'meta_description', 'meta_keywords', 'noindex')
+
+def _inherit(parent, row):
+    if row is None:
+        return parent
+    return {
+        'title': compile_value(row['page_title'], TITLE_LENGTH) \
+            or parent['title'],
+        'description': compile_value(row['meta_description'], DESCRIPTION_LENGTH) \
+            or parent['description'],
+        'keywords': row['meta_keywords'] or parent['keywords'],
+        # robots uses the inverse logic of the meta_robots_noindex event
+        'robots': parent['robots'] if row['noindex'] is None \
+            else not row['noindex'],
+    }
+
+def resolve_category_tree(parents, own, base):
+    """Return the effective SEO values of every category.
+
+    :param parents: A dict mapping category ids to their parent id.
+    :param own: A dict mapping category ids to the values stored for that
+        category (keys as in :data:`CATEGORY_SEO_FIELDS`).
+    :param base: The values inherited by top level categories.
+    :returns: A dict mapping every category id to a dict with the keys
+        'title', 'description', 'keywords' and 'robots'.
+    :rtype: dict
+
+    """
+    resolved = {}
+    for category_id in parents:
+        path = []
+        seen = set()
+        current = category_id
+        while current is not None and current not in resolved \
+                and current not in seen:
+            seen.add(current)
+            path.append(current)
+            current = parents.get(current)
+        # a broken (cyclic) tree is treated like a top level category
+        values = resolved.get(current, base)
+        for ancestor_id in reversed(path):
+            values = _inherit(values, own.get(ancestor_id))
+            resolved[ancestor_id] = values
+    return resolved
+
+def fetch_category_seo(connection, category_id=None):
+    """Return the stored SEO values as a category id -> dict mapping."""
+    query = select([category_seo.c.category_id] +
+                   [category_seo.c[field] for field in CATEGORY_SEO_FIELDS])
+    if category_id is not None:
+        query = query.where(category_seo.c.category_id == category_id)
+    return dict((row[0], dict(zip(CATEGORY_SEO_FIELDS, row[1:])))
+                for row in connection.execute(query))
+
+def load_category_pages(connection, base):
+    """Resolve the whole category tree with two queries.
+
+    :param base: The 'category' page values of the
+        :class:`~mediacoreext.simplestation.seo.lib.resolver.SEOProfile`.
+
+    """
+    parents = dict(connection.execute(
+        select([categories.c.id, categories.c.parent_id])))
+    return resolve_category_tree(parents, fetch_category_seo(connection), base)
+
+def save_category_seo(connection, category_id, values):
+    """Store the SEO values of a category, empty values are inherited.
+
+    :param values: A dict with the keys of :data:`CATEGORY_SEO_FIELDS`.
+
+    """
+    row = dict((field, values.get(field) or None)
+               for field in CATEGORY_SEO_FIELDS[:-1])
+    row['noindex'] = values.get('noindex')
+    connection.execute(category_seo.delete().
+        where(category_seo.c.category_id == category_id))
+    if any(value is not None for value in row.itervalues()):
+        connection.execute(category_seo.insert().
+            values(category_id=category_id, **row))
+    bump_settings_version_in(connection)
+
+def bump_category_version(mapper, connection, target):
+    """Mapper listener for :class:`~mediacore.model.categories.Category`.
+
+    Inserting or deleting a category changes the inherited values and
+    robots.txt, so the settings version is bumped within the same
+    transaction and all workers rebuild their category map.
+
+    """
+    bump_settings_version_in(connection)
+
+# Category attributes which change the tree or the robots.txt entries
+TREE_ATTRIBUTES = ('parent', 'parent_id', 'slug')
+
+def bump_category_version_on_update(mapper, connection, target):
+    """Like :func:`bump_category_version` for the ``after_update`` event,
+    but only if the category was moved or its slug changed. Other updates
+    (e.g. a new name) leave the cached values alone."""
+    if any(get_history(target, name).has_changes()
+           for name in TREE_ATTRIBUTES if hasattr(target, name)):
+        bump_settings_version_in(connection)
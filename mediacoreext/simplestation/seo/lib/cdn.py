@@ -0,0 +1,154 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Surrogate keys for CDN caches and purging them after SEO edits.
+
+Pages whose ``<head>`` depends on SEO values are tagged with surrogate keys:
+``seo-media-<id>`` for media pages, ``seo-page-<kind>`` for the explore,
+podcast, category and upload pages and ``seo-settings`` for every page.
+Saving SEO values only records the affected keys for the current
+transaction. Once it is committed they are handed to a :class:`PingQueue`
+which purges them in batches; a key saved several times within
+``seo.cdn_purge_window`` seconds is purged once.
+
+Purging is enabled by one of:
+
+``seo.cdn_purge_url``
+    POST ``{"surrogate_keys": [...]}`` to this URL (e.g. the batch purge
+    API of Fastly or a local stub server). Extra request headers like the
+    API token are given as ``seo.cdn_purge_headers``, one
+    ``Name: value`` per line.
+``seo.cdn_purger``
+    A custom purger as 'package.module:name', which is called with the
+    config and must return an object with a ``purge(keys)`` method.
+
+The response header defaults to ``Surrogate-Key`` and can be changed with
+``seo.cdn_header``, e.g. to ``Cache-Tag``.
+"""
+
+import json
+import threading
+import urllib2
+
+from pylons import config, response
+
+from mediacoreext.simplestation.seo.lib.after_commit import AfterCommitBuffer
+from mediacoreext.simplestation.seo.lib.indexnow import PingQueue
+
+__all__ = [
+    'get_purge_queue',
+    'HTTPPurger',
+    'media_key',
+    'page_key',
+    'purger_from_config',
+    'queue_purge',
+    'SETTINGS_KEY',
+    'tag_response',
+]
+
+SETTINGS_KEY = 'seo-settings'
+
+DEFAULT_HEADER = 'Surrogate-Key'
+
+def media_key(media_id):
+    """Return the surrogate key of a media page."""
+    return 'seo-media-%d' % media_id
+
+def page_key(kind):
+    """Return the surrogate key of a page kind, e.g. 'explore'."""
+    return 'seo-page-%s' % kind
+
+
+class HTTPPurger(object):
+    """Purge surrogate keys with one POST request per batch.
+
+    :param url: The purge endpoint.
+    :param headers: A dict of additional request headers.
+
+    """
+
+    def __init__(self, url, headers=None, timeout=10):
+        self.url = url
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+
+    def purge(self, keys):
+        """:raises IOError: If the request failed or was not accepted."""
+        headers = dict(self.headers)
+        headers['Content-Type'] = 'application/json; charset=utf-8'
+        request = urllib2.Request(self.url,
+            json.dumps({'surrogate_keys': sorted(keys)}), headers)
+        response = urllib2.urlopen(request, timeout=self.timeout)
+        try:
+            if not 200 <= response.getcode() < 300:
+                raise IOError('CDN purge returned HTTP %s' % response.getcode())
+        finally:
+            response.close()
+
+def _parse_headers(value):
+    headers = {}
+    for line in (value or '').splitlines():
+        if ':' in line:
+            name, header_value = line.split(':', 1)
+            headers[name.strip()] = header_value.strip()
+    return headers
+
+def purger_from_config(config):
+    """Return the purger configured in the given config or None."""
+    path = config.get('seo.cdn_purger')
+    if path:
+        module_name, name = path.split(':')
+        module = __import__(module_name, fromlist=[name])
+        return getattr(module, name)(config)
+    url = config.get('seo.cdn_purge_url')
+    if url:
+        return HTTPPurger(url, _parse_headers(config.get('seo.cdn_purge_headers')))
+    return None
+
+
+_queue = None
+_queue_lock = threading.Lock()
+# cached instead of the queue if purging is not configured, so the check
+# on every page view does not take the lock
+_DISABLED = object()
+
+def get_purge_queue():
+    """Return the purge :class:`PingQueue` of this worker or None if disabled."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                purger = purger_from_config(config)
+                if purger is None:
+                    _queue = _DISABLED
+                    return None
+                _queue = PingQueue(purger.purge,
+                    window=float(config.get('seo.cdn_purge_window', 1.0)),
+                    batch_size=int(config.get('seo.cdn_purge_batch_size', 256)),
+                    max_retries=int(config.get('seo.cdn_purge_max_retries', 5)),
+                    backoff=float(config.get('seo.cdn_purge_backoff', 5.0)),
+                    group=lambda key: None,
+                    name='seo-cdn-purge')
+    if _queue is _DISABLED:
+        return None
+    return _queue
+
+def tag_response(keys):
+    """Add surrogate keys to the response of the current request."""
+    if get_purge_queue() is None:
+        return
+    header = config.get('seo.cdn_header') or DEFAULT_HEADER
+    tags = response.headers.get(header, '').split()
+    tags.extend(key for key in keys if key not in tags)
+    response.headers[header] = ' '.join(tags)
+
+
+_pending_purges = AfterCommitBuffer(get_purge_queue)
+
+def queue_purge(keys):
+    """Purge the given keys once the current transaction is committed."""
+    if get_purge_queue() is not None:
+        _pending_purges.add(keys)
@@ -0,0 +1,104 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Meta descriptions and keywords derived from the media details.
+
+The values are generated when a media item is saved (or by the backfill
+command) and stored as ``seo_auto_*`` meta, so rendering a page never has
+to do more than look them up.
+"""
+
+import re
+
+from sqlalchemy import and_, select
+
+from mediacore.model.media import media
+from mediacore.model.tags import media_tags, tags
+
+__all__ = [
+    'auto_meta_values',
+    'fallback_rows',
+    'make_description',
+    'make_keywords',
+    'shorten',
+]
+
+DESCRIPTION_LENGTH = 155
+MAX_KEYWORDS = 10
+
+_tag_re = re.compile(r'<[^>]*>')
+_space_re = re.compile(r'\s+', re.UNICODE)
+_word_re = re.compile(r'\w[\w\-]+', re.UNICODE)
+
+STOPWORDS = frozenset(u"""
+    about after also and are but can for from has have her his how into its
+    just more not one our out she that the their them then there these they
+    this was were what when where which who will with you your
+""".split())
+
+def make_description(title, description, length=DESCRIPTION_LENGTH):
+    """Return a plain text description of at most ``length`` characters.
+
+    Markup is removed and the text is cut at a word boundary. The title is
+    used if there is no description.
+
+    """
+    text = _tag_re.sub(u' ', description or u'')
+    text = _space_re.sub(u' ', text).strip() or (title or u'').strip()
+    return shorten(text, length)
+
+def shorten(text, length):
+    """Cut the text at a word boundary so it has at most ``length`` characters."""
+    if len(text) <= length:
+        return text or None
+    cut = text[:length - 1].rsplit(u' ', 1)[0].rstrip(u' ,.;:-')
+    return cut + u'\u2026'
+
+def make_keywords(title, tag_names, limit=MAX_KEYWORDS):
+    """Return a comma separated keyword list from tags and title words."""
+    keywords = []
+    seen = set()
+    candidates = list(tag_names or ())
+    candidates += [word for word in _word_re.findall(title or u'')
+                   if len(word) > 2 and word.lower() not in STOPWORDS]
+    for keyword in candidates:
+        keyword = keyword.strip()
+        if keyword and keyword.lower() not in seen:
+            seen.add(keyword.lower())
+            keywords.append(keyword)
+        if len(keywords) >= limit:
+            break
+    return u', '.join(keywords) or None
+
+def auto_meta_values(title, description, tag_names):
+    """Return the ``seo_auto_*`` meta values for the given media details."""
+    return {
+        u'seo_auto_meta_description': make_description(title, description),
+        u'seo_auto_meta_keywords': make_keywords(title, tag_names),
+    }
+
+def fallback_rows(connection, media_ids):
+    """Return ``(id, title, description, tag_names)`` for the given media.
+
+    :param media_ids: A batch of media ids, e.g. from
+        :func:`~mediacoreext.simplestation.seo.lib.batches.id_batches`.
+
+    """
+    query = select([media.c.id, media.c.title, media.c.description_plain],
+                   media.c.id.in_(media_ids)).\
+        order_by(media.c.id)
+    rows = connection.execute(query).fetchall()
+    if not rows:
+        return []
+    tag_names = dict((row[0], []) for row in rows)
+    tag_query = select([media_tags.c.media_id, tags.c.name],
+                       and_(media_tags.c.tag_id == tags.c.id,
+                            media_tags.c.media_id.in_(list(tag_names)))).\
+        order_by(media_tags.c.media_id, tags.c.name)
+    for media_id, name in connection.execute(tag_query):
+        tag_names[media_id].append(name)
+    return [(id, title, description, tag_names[id])
+            for id, title, description in rows]
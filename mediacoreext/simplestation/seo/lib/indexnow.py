@@ -0,0 +1,210 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Notify search engines about changed URLs via IndexNow.
+
+Saving a media item or the settings only records its URLs; once the
+transaction is committed they are put into a :class:`PingQueue` and a
+daemon thread of the worker submits them. Repeated
+edits of the same URL within ``seo.indexnow_window`` seconds end up in one
+submission, up to ``seo.indexnow_batch_size`` URLs are sent per request
+and failed submissions are retried with exponential backoff.
+
+Enable it by setting ``seo.indexnow_key``. ``seo.indexnow_endpoint``
+defaults to the shared IndexNow endpoint and can point to a local HTTP
+server for testing. The key is served at /seo/indexnow-key.txt unless
+``seo.indexnow_key_location`` points elsewhere.
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib2
+from urlparse import urlsplit
+
+from pylons import config
+
+from mediacore.lib.helpers import url_for
+
+from mediacoreext.simplestation.seo.lib.after_commit import AfterCommitBuffer
+
+__all__ = [
+    'DEFAULT_ENDPOINT',
+    'get_ping_queue',
+    'PingQueue',
+    'queue_ping',
+    'submit_urls',
+]
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ENDPOINT = 'https://api.indexnow.org/indexnow'
+# the protocol allows up to 10.000 URLs per request
+MAX_BATCH_SIZE = 10000
+
+def submit_urls(endpoint, key, key_location, urls, timeout=10):
+    """Submit URLs of one host to an IndexNow endpoint.
+
+    :raises IOError: If the request failed or was not accepted.
+
+    """
+    payload = {
+        'host': urlsplit(urls[0]).hostname,
+        'key': key,
+        'urlList': list(urls),
+    }
+    if key_location:
+        payload['keyLocation'] = key_location
+    request = urllib2.Request(endpoint, json.dumps(payload),
+        {'Content-Type': 'application/json; charset=utf-8'})
+    response = urllib2.urlopen(request, timeout=timeout)
+    try:
+        if response.getcode() not in (200, 202):
+            raise IOError('IndexNow endpoint returned HTTP %s'
+                          % response.getcode())
+    finally:
+        response.close()
+
+
+class PingQueue(object):
+    """Coalescing queue of URLs which is submitted by a daemon thread.
+
+    :param submit: A callable taking a list of URLs of the same host,
+        usually :func:`submit_urls` with the endpoint and key bound.
+    :param window: Seconds to wait for further edits of a URL.
+    :param batch_size: Maximum number of URLs per submission.
+    :param max_retries: Give up a batch after this many failures.
+    :param backoff: Seconds to wait after the first failure, doubled
+        after every further failure.
+    :param group: A callable returning the batch an item belongs to,
+        by default the host of a URL.
+    :param name: The name of the thread.
+
+    """
+
+    def __init__(self, submit, window=10.0, batch_size=MAX_BATCH_SIZE,
+                 max_retries=5, backoff=30.0, group=None, name='seo-indexnow'):
+        self.submit = submit
+        self.group = group or (lambda url: urlsplit(url).netloc)
+        self.name = name
+        self.window = window
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.submitted = 0
+        self.failed = 0
+        # url -> (due time, failures)
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def add(self, urls):
+        """Queue URLs for submission, already queued URLs are not added twice."""
+        due = time.time() + self.window
+        with self._condition:
+            for url in urls:
+                self._pending.setdefault(url, (due, 0))
+            self._start()
+            self._condition.notify()
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _take_due(self, now):
+        """Remove and return the due URLs of one host, oldest first."""
+        due = sorted((entry[0], url) for url, entry in self._pending.iteritems()
+                     if entry[0] <= now)
+        if not due:
+            return None, []
+        host = self.group(due[0][1])
+        batch = [url for when, url in due
+                 if self.group(url) == host][:self.batch_size]
+        failures = max(self._pending.pop(url)[1] for url in batch)
+        return failures, batch
+
+    def _next_due(self):
+        if not self._pending:
+            return None
+        return min(entry[0] for entry in self._pending.itervalues())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                now = time.time()
+                failures, batch = self._take_due(now)
+                while not batch:
+                    next_due = self._next_due()
+                    self._condition.wait(next_due and max(next_due - now, 0.1) or None)
+                    now = time.time()
+                    failures, batch = self._take_due(now)
+            self._submit(batch, failures)
+
+    def _submit(self, batch, failures):
+        try:
+            self.submit(batch)
+        except Exception as e:
+            failures += 1
+            if failures > self.max_retries:
+                self.failed += len(batch)
+                log.error('%s: giving up submission of %d items: %s',
+                          self.name, len(batch), e)
+                return
+            delay = self.backoff * 2 ** (failures - 1)
+            log.warning('%s: submission of %d items failed (%s), '
+                        'retrying in %d seconds', self.name, len(batch), e, delay)
+            due = time.time() + delay
+            with self._condition:
+                for url in batch:
+                    # a new edit in the meantime is submitted earlier
+                    if url not in self._pending:
+                        self._pending[url] = (due, failures)
+                self._condition.notify()
+        else:
+            self.submitted += len(batch)
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_ping_queue():
+    """Return the :class:`PingQueue` of this worker or None if disabled.
+
+    It must be called during a request the first time, so that the URL of
+    the key file can be generated.
+
+    """
+    global _queue
+    key = config.get('seo.indexnow_key')
+    if not key:
+        return None
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                endpoint = config.get('seo.indexnow_endpoint') or DEFAULT_ENDPOINT
+                key_location = config.get('seo.indexnow_key_location') or \
+                    url_for(controller='/seo/indexnow', action='key', qualified=True)
+                submit = lambda urls: submit_urls(endpoint, key, key_location, urls)
+                _queue = PingQueue(submit,
+                    window=float(config.get('seo.indexnow_window', 10.0)),
+                    batch_size=int(config.get('seo.indexnow_batch_size', MAX_BATCH_SIZE)),
+                    max_retries=int(config.get('seo.indexnow_max_retries', 5)),
+                    backoff=float(config.get('seo.indexnow_backoff', 30.0)))
+    return _queue
+
+_pending_pings = AfterCommitBuffer(get_ping_queue)
+
+def queue_ping(urls):
+    """Submit the URLs once the current transaction is committed."""
+    if config.get('seo.indexnow_key'):
+        _pending_pings.add(urls)
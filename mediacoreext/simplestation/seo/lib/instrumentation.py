@@ -0,0 +1,158 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Opt-in timing and SQL statement counters for the plugin's observers.
+
+Enable it with ``seo.instrumentation = true`` in the config file. When it
+is disabled :func:`instrumented` returns the observers unchanged, so there
+is no overhead at all.
+"""
+
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from paste.deploy.converters import asbool
+from pylons import config, request
+from sqlalchemy import event
+
+from mediacore.model.meta import DBSession
+
+__all__ = [
+    'get_observer_stats',
+    'instrumentation_enabled',
+    'instrumented',
+    'ObserverStats',
+]
+
+SAMPLE_SIZE = 1000
+PERCENTILES = (50, 90, 95, 99)
+
+def instrumentation_enabled():
+    return asbool(config.get('seo.instrumentation', False))
+
+
+class ObserverStats(object):
+    """Call counts, timings and SQL statement counts per observer.
+
+    Percentiles are computed over the last :data:`SAMPLE_SIZE` calls of
+    each observer.
+
+    """
+
+    def __init__(self, sample_size=SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.requests = 0
+        self._observers = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._engine = None
+
+    def statement_count(self):
+        return getattr(self._local, 'statements', 0)
+
+    def _count_statement(self, *args, **kwargs):
+        self._local.statements = self.statement_count() + 1
+
+    def _listen(self):
+        engine = DBSession.bind
+        if engine is not None and engine is not self._engine:
+            event.listen(engine, 'before_cursor_execute', self._count_statement)
+            self._engine = engine
+
+    def _mark_request(self):
+        try:
+            environ = request.environ
+        except TypeError:
+            # no request, e.g. when called from a command line script
+            return
+        if 'seo.instrumented' not in environ:
+            environ['seo.instrumented'] = True
+            self.requests += 1
+
+    def record(self, name, duration, statements):
+        with self._lock:
+            stats = self._observers.get(name)
+            if stats is None:
+                stats = self._observers[name] = {
+                    'calls': 0, 'total_time': 0.0, 'statements': 0,
+                    'samples': deque(maxlen=self.sample_size),
+                }
+            stats['calls'] += 1
+            stats['total_time'] += duration
+            stats['statements'] += statements
+            stats['samples'].append(duration)
+
+    def wrap(self, func):
+        name = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if self._engine is None:
+                self._listen()
+            self._mark_request()
+            statements = self.statement_count()
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.time() - start,
+                            self.statement_count() - statements)
+        return wrapper
+
+    def snapshot(self):
+        """Return all counters as a JSON serializable dict.
+
+        Times are given in milliseconds.
+
+        """
+        observers = {}
+        with self._lock:
+            items = [(name, dict(stats, samples=sorted(stats['samples'])))
+                     for name, stats in self._observers.iteritems()]
+        for name, stats in items:
+            samples = stats['samples']
+            calls = stats['calls']
+            observers[name] = {
+                'calls': calls,
+                'total_ms': stats['total_time'] * 1000,
+                'mean_ms': calls and stats['total_time'] * 1000 / calls or 0.0,
+                'statements': stats['statements'],
+                'statements_per_call': calls and float(stats['statements']) / calls or 0.0,
+                'percentiles_ms': dict(
+                    ('p%d' % p, samples and samples[min(len(samples) - 1, len(samples) * p // 100)] * 1000 or 0.0)
+                    for p in PERCENTILES),
+            }
+        total_statements = sum(stats['statements'] for name, stats in items)
+        return {
+            'requests': self.requests,
+            'statements_per_request': self.requests and float(total_statements) / self.requests or 0.0,
+            'observers': observers,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._observers.clear()
+            self.requests = 0
+
+
+_stats = ObserverStats()
+
+def get_observer_stats():
+    """Return the :class:`ObserverStats` of this worker."""
+    return _stats
+
+def instrumented(func):
+    """Decorator recording timings of an observer if instrumentation is on.
+
+    It must be applied below ``@observes`` so that the wrapped function is
+    the one which gets registered.
+
+    """
+    if not instrumentation_enabled():
+        return func
+    return _stats.wrap(func)
@@ -0,0 +1,184 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Normalized SEO keywords and the keyword -> media index.
+
+The comma separated meta keywords of every media item are split,
+lowercased and stored once in ``seo_keywords``; ``seo_media_keywords``
+links them to the media. The index is updated whenever the SEO values of
+a media item are saved, so finding related media is a single join over
+two indexed tables instead of LIKE scans over ``media_meta``.
+"""
+
+from sqlalchemy import (Column, ForeignKey, Index, Integer, Table, Unicode,
+    and_, desc, func, select)
+from sqlalchemy.exc import IntegrityError
+
+from mediacore.model.media import media, media_meta
+from mediacore.model.meta import metadata
+
+from mediacoreext.simplestation.seo.lib.batches import chunks
+from mediacoreext.simplestation.seo.lib.sitemap import published_media_clause
+
+__all__ = [
+    'index_keywords',
+    'keyword_index_rows',
+    'keywords',
+    'media_keywords',
+    'normalize_keywords',
+    'related_media',
+    'split_keywords',
+]
+
+keywords = Table('seo_keywords', metadata,
+    Column('id', Integer, autoincrement=True, primary_key=True),
+    Column('name', Unicode(255), nullable=False, unique=True),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+
+media_keywords = Table('seo_media_keywords', metadata,
+    Column('media_id', Integer,
+        ForeignKey('media.id', onupdate='CASCADE', ondelete='CASCADE'),
+        primary_key=True, autoincrement=False),
+    Column('keyword_id', Integer,
+        ForeignKey('seo_keywords.id', onupdate='CASCADE', ondelete='CASCADE'),
+        primary_key=True, autoincrement=False),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+Index('seo_media_keywords_keyword_id', media_keywords.c.keyword_id,
+      media_keywords.c.media_id)
+
+def split_keywords(value):
+    """Return the keywords of a comma separated string."""
+    return [keyword.strip() for keyword in (value or u'').split(u',')
+            if keyword.strip()]
+
+def normalize_keywords(value):
+    """Return the set of lowercased keywords of a comma separated string."""
+    return set(keyword.lower()[:255] for keyword in split_keywords(value))
+
+def _select_keyword_ids(connection, names):
+    ids = {}
+    for chunk in chunks(names):
+        query = select([keywords.c.name, keywords.c.id], keywords.c.name.in_(chunk))
+        ids.update(connection.execute(query).fetchall())
+    return ids
+
+def _insert_keyword(connection, name):
+    # A concurrent save may create the same keyword. Only the savepoint
+    # is rolled back then, not the whole save.
+    savepoint = connection.begin_nested()
+    try:
+        connection.execute(keywords.insert(), {'name': name})
+    except IntegrityError:
+        savepoint.rollback()
+    else:
+        savepoint.commit()
+
+def _keyword_ids(connection, names):
+    """Return a name -> id dict, missing keywords are inserted."""
+    ids = _select_keyword_ids(connection, names)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        for name in missing:
+            _insert_keyword(connection, name)
+        ids.update(_select_keyword_ids(connection, missing))
+    return ids
+
+def index_keywords(connection, values):
+    """Update the keyword index for many media items at once.
+
+    Only the differences to the stored links are written.
+
+    :param values: A dict mapping media ids to their comma separated
+        keywords (or None).
+    :returns: The number of inserted and deleted links.
+    :rtype: int
+
+    """
+    wanted = dict((media_id, normalize_keywords(value))
+                  for media_id, value in values.iteritems())
+    all_names = set()
+    for names in wanted.itervalues():
+        all_names.update(names)
+    ids = _keyword_ids(connection, all_names)
+
+    current = dict((media_id, set()) for media_id in wanted)
+    for chunk in chunks(wanted):
+        query = select([media_keywords.c.media_id, media_keywords.c.keyword_id],
+                       media_keywords.c.media_id.in_(chunk))
+        for media_id, keyword_id in connection.execute(query):
+            current[media_id].add(keyword_id)
+
+    inserts = []
+    deletes = 0
+    for media_id, names in wanted.iteritems():
+        keyword_ids = set(ids[name] for name in names)
+        inserts.extend({'media_id': media_id, 'keyword_id': keyword_id}
+                       for keyword_id in keyword_ids - current[media_id])
+        removed = current[media_id] - keyword_ids
+        if removed:
+            connection.execute(media_keywords.delete().where(and_(
+                media_keywords.c.media_id == media_id,
+                media_keywords.c.keyword_id.in_(list(removed)))))
+            deletes += len(removed)
+    if inserts:
+        connection.execute(media_keywords.insert(), inserts)
+    return len(inserts) + deletes
+
+def keyword_index_rows(connection, media_ids):
+    """Return ``(media_id, keywords, auto_keywords)`` for the given media."""
+    seo = media_meta.alias('seo')
+    auto = media_meta.alias('auto')
+    joined = media.\
+        outerjoin(seo, and_(seo.c.media_id == media.c.id,
+                            seo.c.key == u'seo_meta_keywords')).\
+        outerjoin(auto, and_(auto.c.media_id == media.c.id,
+                             auto.c.key == u'seo_auto_meta_keywords'))
+    query = select([media.c.id, seo.c.value, auto.c.value],
+                   media.c.id.in_(media_ids), from_obj=[joined]).\
+        order_by(media.c.id)
+    return connection.execute(query).fetchall()
+
+def related_media(connection, media_id=None, names=None, limit=5):
+    """Return published media sharing the most keywords with a page.
+
+    Runs a single query over the keyword index.
+
+    :param media_id: Find media related to this media item (which is not
+        part of the result).
+    :param names: Alternatively, a comma separated string of keywords,
+        e.g. the meta keywords of an explore or category page.
+    :returns: A list of ``(id, slug, title, shared keyword count)`` tuples,
+        most shared keywords first.
+    :rtype: list
+
+    """
+    related = media_keywords.alias('related')
+    shared = func.count(related.c.keyword_id).label('shared')
+    if media_id is not None:
+        source = media_keywords.alias('source')
+        joined = source.\
+            join(related, and_(related.c.keyword_id == source.c.keyword_id,
+                               related.c.media_id != source.c.media_id))
+        where = source.c.media_id == media_id
+    else:
+        names = list(normalize_keywords(names))
+        if not names:
+            return []
+        joined = keywords.\
+            join(related, related.c.keyword_id == keywords.c.id)
+        where = keywords.c.name.in_(names)
+    joined = joined.join(media, media.c.id == related.c.media_id)
+    query = select([media.c.id, media.c.slug, media.c.title, shared],
+                   and_(where, published_media_clause()),
+                   from_obj=[joined]).\
+        group_by(media.c.id, media.c.slug, media.c.title).\
+        order_by(desc(shared), desc(media.c.id)).\
+        limit(limit)
+    return connection.execute(query).fetchall()
@@ -0,0 +1,47 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+import threading
+
+__all__ = [
+    'LazyForm',
+]
+
+class LazyForm(object):
+    """Stand-in for a form which is only imported and built on first use.
+
+    MediaCore imports all plugin controllers when a worker starts. Building
+    the ToscaWidgets forms of the admin pages there slows down every worker
+    although only a few admins ever see them. Attribute access and calls
+    are passed on to the real form, so the proxy can be used with
+    ``@validate`` and in templates.
+
+    :param path: The form class as 'package.module:ClassName'.
+
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._form = None
+        self._lock = threading.Lock()
+
+    def get_form(self):
+        form = self._form
+        if form is None:
+            with self._lock:
+                if self._form is None:
+                    module_name, class_name = self._path.split(':')
+                    module = __import__(module_name, fromlist=[class_name])
+                    self._form = getattr(module, class_name)()
+                form = self._form
+        return form
+
+    def __getattr__(self, name):
+        return getattr(self.get_form(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.get_form()(*args, **kwargs)
@@ -0,0 +1,119 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Locale specific SEO values.
+
+The additional languages of a site are configured as ``seo.locales``
+(e.g. ``de, fr``). Every translatable setting and media meta value then has
+a variant per locale, stored under the same key with a ``_<locale>``
+suffix. The locale of a page is taken from its ``lang`` query parameter,
+which is also what the ``hreflang`` alternate links point to; pages
+without it use the regular values.
+"""
+
+import re
+from urllib import urlencode
+from urlparse import parse_qsl, urlsplit, urlunsplit
+
+from genshi.core import escape
+from pylons import config, request
+
+__all__ = [
+    'configured_locales',
+    'hreflang_links',
+    'locale_fieldset_name',
+    'localized_key',
+    'localized_keys',
+    'localized_url',
+    'LOCALE_PARAM',
+    'request_locale',
+]
+
+LOCALE_PARAM = 'lang'
+
+_locale_re = re.compile(r'^[a-z]{2,3}(?:_[A-Za-z]{2,4})?$')
+
+_parsed = (None, ())
+
+def configured_locales():
+    """Return the tuple of locales configured as ``seo.locales``.
+
+    :raises ValueError: For values which do not look like a locale.
+
+    """
+    global _parsed
+    raw = config.get('seo.locales') or ''
+    if _parsed[0] != raw:
+        locales = []
+        for locale in re.split(r'[\s,]+', raw.strip()):
+            if not locale:
+                continue
+            if not _locale_re.match(locale):
+                raise ValueError('Invalid locale %r in seo.locales' % locale)
+            if locale not in locales:
+                locales.append(locale)
+        _parsed = (raw, tuple(locales))
+    return _parsed[1]
+
+def localized_key(key, locale):
+    """Return the setting or meta key of ``key`` for the given locale."""
+    return u'%s_%s' % (key, locale)
+
+def localized_keys(keys, locales=None):
+    """Return the keys for all configured (or the given) locales."""
+    if locales is None:
+        locales = configured_locales()
+    return tuple(localized_key(key, locale)
+                 for locale in locales for key in keys)
+
+def locale_fieldset_name(locale):
+    """Return the name of the form fieldset holding a locale's values."""
+    return 'locale_%s' % locale
+
+def request_locale():
+    """Return the configured locale requested for this page or None."""
+    try:
+        locale = request.GET.get(LOCALE_PARAM)
+    except TypeError:
+        # no request, e.g. in a command
+        return None
+    if locale and locale in configured_locales():
+        return locale
+    return None
+
+def localized_url(url, locale=None):
+    """Return ``url`` with the ``lang`` parameter set to ``locale``.
+
+    Without a locale the parameter is removed.
+
+    """
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    params = [(name, value) for name, value in parse_qsl(query)
+              if name != LOCALE_PARAM]
+    if locale:
+        params.append((LOCALE_PARAM, locale))
+    return urlunsplit((scheme, netloc, path, urlencode(params), fragment))
+
+def hreflang_links(url, locales=None):
+    """Return the ``<link rel="alternate" hreflang="...">`` tags of a page.
+
+    The page without a ``lang`` parameter is the ``x-default`` version.
+
+    :param url: The absolute URL of the page in any of its languages.
+    :rtype: unicode
+
+    """
+    if locales is None:
+        locales = configured_locales()
+    if not locales:
+        return u''
+    alternates = [('x-default', localized_url(url))]
+    alternates.extend((locale.replace('_', '-'), localized_url(url, locale))
+                      for locale in locales)
+    return u'\n'.join(
+        u'<link rel="alternate" hreflang="%s" href="%s" />'
+        % (hreflang, escape(alternate, quote=True))
+        for hreflang, alternate in alternates)
@@ -0,0 +1,253 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+from sqlalchemy import bindparam
+
+from mediacore.model.media import MediaMeta, media_meta
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.lib.batches import chunks
+from mediacoreext.simplestation.seo.lib.keywords import index_keywords
+from mediacoreext.simplestation.seo.lib.locales import localized_keys
+from mediacoreext.simplestation.seo.lib.settings_cache import bump_meta_version_in
+from mediacoreext.simplestation.seo.lib.sitemap import sitemap_urls
+from mediacoreext.simplestation.seo.lib.sitemap_files import queue_dirty_media
+from mediacoreext.simplestation.seo.lib.social import SOCIAL_IMAGE_META_KEY
+from mediacoreext.simplestation.seo.lib.structured_data import (details_jsonld,
+    fetch_media_details, JSONLD_META_KEY, JSONLD_SOURCE_KEYS, media_jsonld)
+
+__all__ = [
+    'AUTO_META_KEYS',
+    'fetch_seo_meta',
+    'forget_seo_meta',
+    'get_seo_meta',
+    'preload_seo_meta',
+    'save_seo_meta',
+    'update_seo_meta',
+    'SEO_META_KEYS',
+    'writable_meta_keys',
+]
+
+SEO_META_KEYS = (u'seo_page_title', u'seo_meta_description', u'seo_meta_keywords')
+# generated from the media details, see lib.fallbacks
+AUTO_META_KEYS = (u'seo_auto_meta_description', u'seo_auto_meta_keywords')
+# all meta keys written by the plugin
+WRITABLE_META_KEYS = SEO_META_KEYS + AUTO_META_KEYS + \
+    (JSONLD_META_KEY, SOCIAL_IMAGE_META_KEY)
+
+# the keyword index is built from these values
+KEYWORD_KEYS = frozenset([u'seo_meta_keywords', u'seo_auto_meta_keywords'])
+
+def writable_meta_keys():
+    """Return all meta keys written by the plugin, including the
+    locale specific variants of :data:`SEO_META_KEYS`."""
+    return WRITABLE_META_KEYS + localized_keys(SEO_META_KEYS)
+
+def preload_seo_meta(media_list):
+    """Load the SEO meta of all given media items with one query per chunk.
+
+    The values are attached to each instance so that :func:`get_seo_meta`
+    can return them without touching the lazy ``Media._meta`` relationship.
+    Items which already have their meta loaded are skipped.
+
+    :param media_list: An iterable of :class:`~mediacore.model.media.Media`
+    :returns: The number of media items which were preloaded.
+    :rtype: int
+
+    """
+    by_id = {}
+    for media in media_list:
+        state = media.__dict__
+        if media.id is None or '_seo_meta' in state or '_meta' in state:
+            continue
+        media._seo_meta = {}
+        by_id[media.id] = media
+    ids = list(by_id)
+    for chunk in chunks(ids):
+        rows = DBSession.query(MediaMeta.media_id, MediaMeta.key, MediaMeta.value).\
+            filter(MediaMeta.media_id.in_(chunk)).\
+            filter(MediaMeta.key.in_(SEO_META_KEYS + AUTO_META_KEYS +
+                                     localized_keys(SEO_META_KEYS)))
+        for media_id, key, value in rows:
+            by_id[media_id]._seo_meta[key] = value
+    return len(ids)
+
+def get_seo_meta(media):
+    """Return a dict-like object with the SEO meta of the given media.
+
+    Values preloaded by :func:`preload_seo_meta` are used when present,
+    otherwise this falls back to the regular ``media.meta`` proxy.
+
+    """
+    meta = media.__dict__.get('_seo_meta')
+    if meta is None:
+        return media.meta
+    return meta
+
+def forget_seo_meta(media):
+    """Discard preloaded SEO meta, e.g. after the values were changed."""
+    media.__dict__.pop('_seo_meta', None)
+
+def fetch_seo_meta(media_ids):
+    """Return the stored meta written by the plugin for the given media ids.
+
+    :returns: A dict ``{media_id: {key: (meta_id, value)}}``
+    :rtype: dict
+
+    """
+    stored = dict((media_id, {}) for media_id in media_ids)
+    for chunk in chunks(media_ids):
+        rows = DBSession.query(MediaMeta.id, MediaMeta.media_id,
+                               MediaMeta.key, MediaMeta.value).\
+            filter(MediaMeta.media_id.in_(chunk)).\
+            filter(MediaMeta.key.in_(writable_meta_keys()))
+        for id, media_id, key, value in rows:
+            stored[media_id][key] = (id, value)
+    return stored
+
+def _write_seo_meta(changes, stored, dry_run=False):
+    """Apply all changes with one INSERT, UPDATE and DELETE at most.
+
+    Nothing is written if ``dry_run`` is True.
+
+    :returns: The ids of all media items which actually changed.
+    :rtype: list
+
+    """
+    inserts, updates, deletes, changed_ids = [], [], [], []
+    writable = frozenset(writable_meta_keys())
+    for media_id, values in changes.iteritems():
+        media_stored = stored.get(media_id, {})
+        changed = False
+        for key, value in values.iteritems():
+            if key not in writable:
+                continue
+            if key in media_stored:
+                meta_id, old_value = media_stored[key]
+                if not value:
+                    deletes.append(meta_id)
+                    changed = True
+                elif value != old_value:
+                    updates.append({'meta_id': meta_id, 'meta_value': value})
+                    changed = True
+            elif value:
+                inserts.append({'media_id': media_id, 'key': key, 'value': value})
+                changed = True
+        if changed:
+            changed_ids.append(media_id)
+
+    if dry_run:
+        return changed_ids
+    if inserts:
+        DBSession.execute(media_meta.insert(), inserts)
+    if updates:
+        DBSession.execute(media_meta.update().\
+            where(media_meta.c.id == bindparam('meta_id')).\
+            values(value=bindparam('meta_value')), updates)
+    for chunk in chunks(deletes):
+        DBSession.execute(media_meta.delete().\
+            where(media_meta.c.id.in_(chunk)))
+    return changed_ids
+
+def _needs_jsonld(values):
+    return JSONLD_META_KEY not in values \
+        and not frozenset(JSONLD_SOURCE_KEYS).isdisjoint(values)
+
+def _merged_values(media_stored, values):
+    merged = dict((key, value) for key, (meta_id, value)
+                  in media_stored.iteritems())
+    merged.update(values)
+    return merged
+
+def _indexed_keywords(merged):
+    return merged.get(u'seo_meta_keywords') or merged.get(u'seo_auto_meta_keywords')
+
+def _update_keyword_index(changes, stored, media_ids):
+    values = dict((media_id, _indexed_keywords(
+                      _merged_values(stored.get(media_id, {}), changes[media_id])))
+                  for media_id in media_ids
+                  if not KEYWORD_KEYS.isdisjoint(changes[media_id]))
+    if values:
+        index_keywords(DBSession.connection(), values)
+
+def save_seo_meta(media, values):
+    """Write the given SEO meta values with at most one statement per kind.
+
+    All changes are applied as one batched INSERT, one batched UPDATE and
+    one DELETE (each only if needed) instead of mutating ``media.meta``
+    key by key. Empty values remove the stored meta; values which did not
+    change are not written at all. The JSON-LD is rebuilt if any value it
+    is made of is given, the keyword index is updated for new keywords.
+
+    :param media: A :class:`~mediacore.model.media.Media` instance
+    :param values: A dict mapping ``seo_*`` meta keys to their new values
+    :returns: True if anything was written to the database.
+    :rtype: bool
+
+    """
+    if '_meta' in media.__dict__:
+        writable = frozenset(writable_meta_keys())
+        stored = {media.id: dict((key, (meta.id, meta.value))
+                                 for key, meta in media._meta.iteritems()
+                                 if key in writable)}
+    else:
+        stored = fetch_seo_meta([media.id])
+
+    if _needs_jsonld(values):
+        values = dict(values)
+        values[JSONLD_META_KEY] = media_jsonld(media,
+            _merged_values(stored[media.id], values), sitemap_urls())
+    if not _write_seo_meta({media.id: values}, stored):
+        return False
+    _update_keyword_index({media.id: values}, stored, [media.id])
+    # The meta relationship no longer matches the database.
+    DBSession.expire(media, ['_meta'])
+    # cached page values are keyed on the meta version
+    bump_meta_version_in(DBSession.connection())
+    queue_dirty_media([media.id])
+    forget_seo_meta(media)
+    return True
+
+def update_seo_meta(changes, dry_run=False, stored=None):
+    """Write the SEO meta of many media items with a few batched statements.
+
+    This is the bulk counterpart of :func:`save_seo_meta` which works on
+    media ids only, so no media instances are loaded into the session.
+    Like there, the JSON-LD and the keyword index of media whose values
+    are given are kept up to date.
+
+    :param changes: A dict mapping media ids to dicts of ``seo_*`` meta
+        keys and their new values. Keys which are not given are left alone.
+    :param dry_run: Only determine which media items would change.
+    :param stored: The result of :func:`fetch_seo_meta` for all media
+        items in ``changes`` if the caller already loaded it.
+    :returns: The ids of all media items which (would have) changed.
+    :rtype: list
+
+    """
+    if stored is None:
+        stored = fetch_seo_meta(list(changes))
+    jsonld_ids = [media_id for media_id, values in changes.iteritems()
+                  if _needs_jsonld(values)]
+    if jsonld_ids and not dry_run:
+        urls = sitemap_urls()
+        details = fetch_media_details(DBSession.connection(), jsonld_ids)
+        changes = dict(changes)
+        for media_id in jsonld_ids:
+            if media_id not in details:
+                continue
+            values = changes[media_id] = dict(changes[media_id])
+            values[JSONLD_META_KEY] = details_jsonld(details[media_id],
+                _merged_values(stored.get(media_id, {}), values), urls)
+    changed_ids = _write_seo_meta(changes, stored, dry_run)
+    if dry_run:
+        return changed_ids
+    _update_keyword_index(changes, stored, changed_ids)
+    if changed_ids:
+        bump_meta_version_in(DBSession.connection())
+        queue_dirty_media(changed_ids)
+    return changed_ids
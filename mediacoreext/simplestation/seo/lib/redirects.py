@@ -0,0 +1,234 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Permanent redirects from the old URLs of renamed media.
+
+Whenever the slug of a media item changes, the old path is stored in the
+``seo_redirects`` table. Every worker keeps all redirects in a
+:class:`RedirectTrie` which is refreshed incrementally, so checking a
+request path never needs a database query.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from pylons import config
+from sqlalchemy import Column, DateTime, Integer, Table, Unicode, func, select
+from sqlalchemy.orm.attributes import get_history
+
+from mediacore.model.meta import DBSession, metadata
+
+__all__ = [
+    'get_redirect_index',
+    'media_path',
+    'RedirectIndex',
+    'RedirectTrie',
+    'record_slug_change',
+    'redirects',
+    'release_media_path',
+]
+
+redirects = Table('seo_redirects', metadata,
+    Column('id', Integer, autoincrement=True, primary_key=True),
+    Column('source', Unicode(255), nullable=False, unique=True),
+    # NULL marks a redirect which was removed
+    Column('target', Unicode(255), nullable=True),
+    Column('modified_on', DateTime, nullable=False),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+
+def media_path(slug):
+    """Return the path of a media view page (relative to the app root)."""
+    return u'/media/%s' % slug
+
+
+class RedirectTrie(object):
+    """A path segment trie mapping old paths to their new location.
+
+    Lookups find the longest redirected prefix of a path, so sub pages
+    like '/media/old-slug/embed_player' are redirected as well. Leaves
+    are stored as plain strings, which keeps hundreds of thousands of
+    entries reasonably small.
+
+    """
+
+    def __init__(self):
+        self._root = {}
+        self.size = 0
+
+    @staticmethod
+    def _segments(path):
+        return [segment for segment in path.split(u'/') if segment]
+
+    def add(self, source, target):
+        node = self._root
+        segments = self._segments(source)
+        for segment in segments[:-1]:
+            child = node.get(segment)
+            if not isinstance(child, dict):
+                child = node[segment] = {None: child}
+            node = child
+        last = segments[-1]
+        child = node.get(last)
+        if isinstance(child, dict):
+            if child.get(None) is None:
+                self.size += 1
+            child[None] = target
+        else:
+            if child is None:
+                self.size += 1
+            node[last] = target
+
+    def remove(self, source):
+        node = self._root
+        segments = self._segments(source)
+        for segment in segments[:-1]:
+            node = node.get(segment)
+            if not isinstance(node, dict):
+                return
+        child = node.get(segments[-1])
+        if isinstance(child, dict):
+            if child.get(None) is not None:
+                child[None] = None
+                self.size -= 1
+        elif child is not None:
+            del node[segments[-1]]
+            self.size -= 1
+
+    def lookup(self, path):
+        """Return the redirect target for the given path or None."""
+        node = self._root
+        segments = self._segments(path)
+        match = None
+        for i, segment in enumerate(segments):
+            child = node.get(segment)
+            if child is None:
+                break
+            if not isinstance(child, dict):
+                match = (child, i + 1)
+                break
+            if child.get(None) is not None:
+                match = (child[None], i + 1)
+            node = child
+        if match is None:
+            return None
+        target, matched = match
+        rest = segments[matched:]
+        if rest:
+            target = u'%s/%s' % (target.rstrip(u'/'), u'/'.join(rest))
+        return target
+
+
+class RedirectIndex(object):
+    """The redirects of this worker, refreshed from the database.
+
+    At most every ``refresh_interval`` seconds only the rows modified
+    since the last refresh are loaded. Rows are stamped with the database
+    clock and compared with the newest stamp read so far, so clock skew
+    between the worker nodes does not matter. The ``overlap`` covers
+    transactions which committed after a refresh but got their stamp
+    before it (``NOW()`` is the transaction start on some databases).
+
+    :param engine: The SQLAlchemy engine to read the redirects from.
+
+    """
+
+    overlap = timedelta(minutes=1)
+
+    def __init__(self, engine, refresh_interval=10.0):
+        self.engine = engine
+        self.refresh_interval = refresh_interval
+        self.trie = RedirectTrie()
+        self._last_modified = None
+        self._next_refresh = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        query = select([redirects.c.source, redirects.c.target,
+                        redirects.c.modified_on])
+        if self._last_modified is not None:
+            # applying a row twice does no harm
+            query = query.where(redirects.c.modified_on >=
+                                self._last_modified - self.overlap)
+        connection = self.engine.connect()
+        try:
+            for source, target, modified_on in connection.execute(query):
+                if target:
+                    self.trie.add(source, target)
+                else:
+                    self.trie.remove(source)
+                if self._last_modified is None or modified_on > self._last_modified:
+                    self._last_modified = modified_on
+        finally:
+            connection.close()
+
+    def lookup(self, path):
+        now = time.time()
+        if now >= self._next_refresh and self._lock.acquire(False):
+            try:
+                self._next_refresh = now + self.refresh_interval
+                self.refresh()
+            finally:
+                self._lock.release()
+        return self.trie.lookup(path)
+
+
+_index = None
+
+def get_redirect_index():
+    """Return the :class:`RedirectIndex` of this worker."""
+    global _index
+    if _index is None:
+        _index = RedirectIndex(DBSession.bind,
+            float(config.get('seo.redirects_refresh_interval', 10.0)))
+    return _index
+
+def record_slug_change(mapper, connection, target):
+    """Store a redirect if the slug of a media item is about to change.
+
+    This is a ``before_update`` mapper listener for
+    :class:`~mediacore.model.media.Media`, so redirects are recorded no
+    matter how the media item was changed, in the same transaction.
+
+    """
+    added, unchanged, deleted = get_history(target, 'slug')
+    if not (added and deleted) or added[0] == deleted[0]:
+        return
+    source, new_path = media_path(deleted[0]), media_path(added[0])
+    now = func.now()
+    # keep chains short: everything pointing to the old path now points
+    # to the new one
+    connection.execute(redirects.update().
+        where(redirects.c.target == source).
+        values(target=new_path, modified_on=now))
+    # the media item got an old slug back, that one must not redirect
+    connection.execute(redirects.update().
+        where(redirects.c.source == new_path).
+        values(target=None, modified_on=now))
+    result = connection.execute(redirects.update().
+        where(redirects.c.source == source).
+        values(target=new_path, modified_on=now))
+    if not result.rowcount:
+        connection.execute(redirects.insert().
+            values(source=source, target=new_path, modified_on=now))
+
+def release_media_path(mapper, connection, target):
+    """Remove a redirect away from the path of a newly created media item.
+
+    This is an ``after_insert`` mapper listener for
+    :class:`~mediacore.model.media.Media`. A new item may take a slug
+    which an older item gave up; the redirect route is matched before the
+    media routes, so the new item would not be reachable otherwise.
+
+    """
+    if not target.slug:
+        return
+    connection.execute(redirects.update().
+        where(redirects.c.source == media_path(target.slug)).
+        where(redirects.c.target != None).
+        values(target=None, modified_on=func.now()))
@@ -0,0 +1,342 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+import time
+
+from pylons import config
+
+from mediacore.model.meta import DBSession
+
+from mediacoreext.simplestation.seo.lib.cache import LRUCache
+from mediacoreext.simplestation.seo.lib.categories import load_category_pages
+from mediacoreext.simplestation.seo.lib.keywords import related_media
+from mediacoreext.simplestation.seo.lib.locales import (configured_locales,
+    localized_key, request_locale)
+from mediacoreext.simplestation.seo.lib.media_meta import get_seo_meta
+from mediacoreext.simplestation.seo.lib.settings_cache import get_settings_cache
+from mediacoreext.simplestation.seo.lib.text_templates import (compile_page,
+    render_values)
+
+__all__ = [
+    'forget_media_head',
+    'get_head_cache',
+    'get_related_cache',
+    'get_seo_profile',
+    'page_kind',
+    'related_media_of',
+    'reset_seo_profile',
+    'resolve_page',
+    'robots_kind',
+    'SEOProfile',
+    'SEO_PAGE_KINDS',
+]
+
+SEO_PAGE_KINDS = ('explore', 'podcast', 'category', 'upload')
+
+# Values returned for pages the plugin knows nothing about.
+EMPTY_PAGE = {'title': None, 'description': None, 'keywords': None,
+              'robots': False}
+
+
+def page_kind(category=None, media=None, podcast=None, upload=None):
+    """Map the arguments of a page_title/meta_* event to a page kind.
+
+    A :class:`~mediacore.model.categories.Category` instance passed as
+    ``category`` is a 'category' page as well, see :func:`resolve_page`.
+
+    :returns: One of 'category', 'explore', 'media', 'podcast', 'upload'
+        or None if the page is not handled by the SEO plugin.
+    :rtype: str or None
+
+    """
+    if category == 'all':
+        return 'category'
+    elif media == 'all':
+        return 'explore'
+    elif media:
+        return 'media'
+    elif podcast == 'all':
+        return 'podcast'
+    elif upload == 'all':
+        return 'upload'
+    elif category:
+        return 'category'
+    return None
+
+def robots_kind(category=None, rss=None):
+    """Map the arguments of the meta_robots_noindex event to a page kind."""
+    if category:
+        return 'category'
+    elif rss:
+        return 'rss'
+    return None
+
+
+class SEOProfile(object):
+    """All SEO settings compiled into a page kind -> values table.
+
+    Every entry of :attr:`pages` is a dict with the keys 'title',
+    'description', 'keywords' and 'robots', with the general site-wide
+    description and keywords already filled in where a page does not
+    define its own. Resolving a page is then a single dict lookup.
+    Titles and descriptions with placeholders are compiled into
+    :class:`~mediacoreext.simplestation.seo.lib.text_templates.TextTemplate`
+    instances here, once per settings version.
+
+    :attr:`locale_pages` holds the same table for every configured locale,
+    keyed by ``(locale, kind)``. A locale specific value falls back to the
+    regular value of the page, then to the general value of the locale and
+    finally to the regular general value.
+
+    """
+
+    def __init__(self, settings, version=None):
+        self.version = version
+        self._categories = None
+
+        def setting(key):
+            return settings.get(key, None) or None
+
+        general = {
+            'title': None,
+            'description': setting(u'seo_general_meta_description'),
+            'keywords': setting(u'seo_general_meta_keywords'),
+            'robots': False,
+        }
+        self.pages = {'media': general}
+        for kind in SEO_PAGE_KINDS:
+            self.pages[kind] = {
+                'title': setting(u'seo_%s_page_title' % kind),
+                'description': setting(u'seo_%s_meta_description' % kind) \
+                    or general['description'],
+                'keywords': setting(u'seo_%s_meta_keywords' % kind) \
+                    or general['keywords'],
+                'robots': False,
+            }
+        self.noindex_categories = bool(setting(u'seo_options_noindex_categories'))
+        self.noindex_rss = bool(setting(u'seo_options_noindex_rss'))
+        self.auto_fallbacks = bool(setting(u'seo_options_auto_fallbacks'))
+        # The <meta robots> tag in the template is stripped when the
+        # meta_robots_noindex event returns True, hence the inverse logic.
+        self.pages['category']['robots'] = not self.noindex_categories
+        self.pages['rss'] = dict(EMPTY_PAGE, robots=not self.noindex_rss)
+        self.locale_pages = {}
+        for locale in configured_locales():
+            self._add_locale(locale, setting)
+        for page in self.pages.values() + self.locale_pages.values():
+            compile_page(page)
+
+    def _add_locale(self, locale, setting):
+        def local(key):
+            return setting(localized_key(key, locale))
+
+        general = {
+            'title': None,
+            'description': local(u'seo_general_meta_description') \
+                or self.pages['media']['description'],
+            'keywords': local(u'seo_general_meta_keywords') \
+                or self.pages['media']['keywords'],
+            'robots': self.pages['media']['robots'],
+        }
+        self.locale_pages[(locale, 'media')] = general
+        for kind in SEO_PAGE_KINDS:
+            self.locale_pages[(locale, kind)] = {
+                'title': local(u'seo_%s_page_title' % kind) \
+                    or self.pages[kind]['title'],
+                'description': local(u'seo_%s_meta_description' % kind) \
+                    or setting(u'seo_%s_meta_description' % kind) \
+                    or general['description'],
+                'keywords': local(u'seo_%s_meta_keywords' % kind) \
+                    or setting(u'seo_%s_meta_keywords' % kind) \
+                    or general['keywords'],
+                'robots': self.pages[kind]['robots'],
+            }
+        self.locale_pages[(locale, 'rss')] = dict(self.pages['rss'])
+
+    def page(self, kind, locale=None):
+        """Return the values of a page kind in the given locale."""
+        if locale is not None:
+            page = self.locale_pages.get((locale, kind))
+            if page is not None:
+                return page
+        return self.pages.get(kind, EMPTY_PAGE)
+
+    def resolve(self, kind, meta=None, locale=None):
+        """Return the SEO values for the given page kind.
+
+        :param kind: A page kind as returned by :func:`page_kind`.
+        :param meta: Optional dict of ``seo_*`` media meta values which
+            take precedence over the settings for media pages.
+        :param locale: Optional configured locale, see :meth:`page`.
+        :rtype: dict
+
+        """
+        page = self.page(kind, locale)
+        if kind != 'media' or not meta:
+            return page
+
+        def value(key):
+            if locale is not None:
+                return meta.get(localized_key(key, locale)) or meta.get(key)
+            return meta.get(key)
+
+        description = value(u'seo_meta_description')
+        keywords = value(u'seo_meta_keywords')
+        if self.auto_fallbacks:
+            description = description or meta.get(u'seo_auto_meta_description')
+            keywords = keywords or meta.get(u'seo_auto_meta_keywords')
+        return {
+            'title': value(u'seo_page_title') or None,
+            'description': description or page['description'],
+            'keywords': keywords or page['keywords'],
+            'robots': page['robots'],
+        }
+
+    def resolve_category(self, category_id):
+        """Return the SEO values of a single category page.
+
+        The values of all categories are resolved together on first use,
+        see :func:`~mediacoreext.simplestation.seo.lib.categories.load_category_pages`.
+
+        """
+        categories = self._categories
+        if categories is None:
+            categories = self._categories = _category_pages(self)
+        return categories.get(category_id, self.pages['category'])
+
+
+def _category_pages(profile):
+    # Workers share the resolved tree through the settings backend. Saving
+    # a category or the settings bumps the version, which makes this stale.
+    backend = get_settings_cache().backend
+    cached = backend.get('categories')
+    if cached is not None and cached[0] == profile.version:
+        return cached[1]
+    categories = load_category_pages(DBSession.connection(),
+                                     profile.pages['category'])
+    backend.set('categories', (profile.version, categories))
+    return categories
+
+
+_profile = None
+
+def get_seo_profile():
+    """Return the :class:`SEOProfile` for this worker.
+
+    The profile is rebuilt whenever the settings version changed, which
+    may have happened in any other worker process.
+
+    """
+    global _profile
+    version, settings = get_settings_cache().get()
+    profile = _profile
+    if profile is None or profile.version != version:
+        profile = _profile = SEOProfile(settings, version=version)
+    return profile
+
+def reset_seo_profile():
+    """Drop the compiled profile so it is rebuilt from the saved settings."""
+    global _profile
+    _profile = None
+    get_settings_cache().invalidate()
+    get_head_cache().clear()
+
+
+_head_cache = None
+
+def get_head_cache():
+    """Return the LRU cache of resolved media page values of this worker.
+
+    Its size is configured by ``seo.head_cache_size`` (default: 1000).
+
+    """
+    global _head_cache
+    if _head_cache is None:
+        _head_cache = LRUCache(int(config.get('seo.head_cache_size', 1000)))
+    return _head_cache
+
+def resolve_page(kind, media=None, category=None, locale=None):
+    """Return the SEO values of a page, see :meth:`SEOProfile.resolve`.
+
+    ``locale`` defaults to the locale requested for the current page, see
+    :func:`~mediacoreext.simplestation.seo.lib.locales.request_locale`.
+
+    Pages of a single category (``category`` is a
+    :class:`~mediacore.model.categories.Category`) use the values of that
+    category, which are inherited from its parents.
+
+    Templates are rendered for the given media or category. Values of
+    media pages are cached (rendered) per media id together with the
+    settings version and the media's modification date, so changes made
+    in other workers are picked up as well. Each locale of a media page
+    has an entry of its own.
+
+    """
+    if locale is None:
+        locale = request_locale()
+    profile = get_seo_profile()
+    if kind == 'category' and getattr(category, 'id', None) is not None:
+        return render_values(profile.resolve_category(category.id),
+                             category=category)
+    if kind != 'media':
+        return render_values(profile.resolve(kind, locale=locale))
+    if media.id is None:
+        return render_values(profile.resolve(kind, get_seo_meta(media), locale),
+                             media=media)
+    cache = get_head_cache()
+    key = locale is None and media.id or (media.id, locale)
+    revision = (profile.version, get_settings_cache().meta_version,
+                media.modified_on)
+    values = cache.get(key, revision=revision)
+    if values is not None:
+        return values
+    values = render_values(profile.resolve(kind, get_seo_meta(media), locale),
+                           media=media)
+    cache.set(key, values, revision)
+    return values
+
+def forget_media_head(media_id):
+    """Drop the cached values of a media page after it was saved."""
+    cache = get_head_cache()
+    cache.pop(media_id)
+    for locale in configured_locales():
+        cache.pop((media_id, locale))
+
+
+_related_cache = None
+
+def get_related_cache():
+    """Return the LRU cache of related media lists of this worker.
+
+    Its size is configured by ``seo.related_cache_size`` (default: 1000).
+
+    """
+    global _related_cache
+    if _related_cache is None:
+        _related_cache = LRUCache(int(config.get('seo.related_cache_size', 1000)))
+    return _related_cache
+
+def related_media_of(media):
+    """Return the cached result of
+    :func:`~mediacoreext.simplestation.seo.lib.keywords.related_media`.
+
+    Entries are cached per media id together with the media's modification
+    date and the SEO meta version. The keywords of the other media may change as well, so entries
+    also expire after ``seo.related_media_ttl`` seconds (default: 300).
+
+    """
+    ttl = int(config.get('seo.related_media_ttl', 300))
+    revision = (media.modified_on, get_settings_cache().meta_version,
+                int(time.time() // max(ttl, 1)))
+    cache = get_related_cache()
+    related = cache.get(media.id, revision=revision)
+    if related is not None:
+        return related
+    related = [tuple(row) for row in
+               related_media(DBSession.connection(), media_id=media.id)]
+    cache.set(media.id, related, revision)
+    return related
@@ -0,0 +1,101 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""robots.txt and X-Robots-Tag headers derived from the noindex options.
+
+The <meta robots> tag only helps after a crawler fetched the whole page.
+robots.txt keeps crawlers away from category pages and feeds in the first
+place. It is generated once per settings version and shared by all
+workers through the settings cache backend.
+"""
+
+from sqlalchemy import select
+
+from mediacore.lib.helpers import url_for
+from mediacore.model.categories import categories
+
+from mediacoreext.simplestation.seo.lib.resolver import get_seo_profile
+from mediacoreext.simplestation.seo.lib.settings_cache import get_settings_cache
+
+__all__ = [
+    'get_robots_txt',
+    'NOINDEX_HEADER',
+    'render_robots_txt',
+    'robots_paths',
+]
+
+NOINDEX_HEADER = 'noindex'
+
+def _prefix(url, placeholder=u'SEOSLUG'):
+    return url.split(placeholder, 1)[0]
+
+def robots_paths():
+    """Return the URL paths which robots.txt refers to.
+
+    'category' and the feed entries ending in '/' are prefixes which are
+    followed by a slug.
+
+    """
+    return {
+        'categories': url_for(controller='/categories', action='index'),
+        'category': _prefix(url_for(controller='/categories', action='index',
+                                    slug=u'SEOSLUG')),
+        'feeds': [
+            _prefix(url_for(controller='/categories', action='feed',
+                            slug=u'SEOSLUG')),
+            _prefix(url_for(controller='/podcasts', action='feed',
+                            slug=u'SEOSLUG')),
+            url_for(controller='/sitemaps', action='mrss'),
+            url_for(controller='/sitemaps', action='latest'),
+            url_for(controller='/sitemaps', action='featured'),
+        ],
+        'sitemap': url_for(controller='/seo/sitemaps', action='index',
+                           qualified=True),
+    }
+
+def render_robots_txt(profile, category_slugs, paths):
+    """Return the robots.txt content for the given settings.
+
+    :param profile: An :class:`~.resolver.SEOProfile`.
+    :param category_slugs: A list of ``(category_id, slug)`` tuples.
+    :param paths: The paths returned by :func:`robots_paths`.
+    :rtype: unicode
+
+    """
+    disallow = []
+    noindexed = [slug for category_id, slug in category_slugs
+                 if not profile.resolve_category(category_id)['robots']]
+    if profile.noindex_categories and len(noindexed) == len(category_slugs):
+        disallow.append(paths['categories'])
+    else:
+        if profile.noindex_categories:
+            disallow.append(paths['categories'] + u'$')
+        # '$' and '?' keep 'foo' from matching the 'foobar' category
+        for slug in sorted(noindexed):
+            disallow.append(u'%s%s$' % (paths['category'], slug))
+            disallow.append(u'%s%s?' % (paths['category'], slug))
+    if profile.noindex_rss:
+        disallow.extend(paths['feeds'])
+    lines = [u'User-agent: *']
+    lines.extend(u'Disallow: %s' % path for path in disallow)
+    if not disallow:
+        lines.append(u'Disallow:')
+    lines.append(u'')
+    lines.append(u'Sitemap: %s' % paths['sitemap'])
+    return u'\n'.join(lines) + u'\n'
+
+def get_robots_txt(connection):
+    """Return the robots.txt for the current settings version."""
+    profile = get_seo_profile()
+    backend = get_settings_cache().backend
+    cached = backend.get('robots')
+    if cached is not None and cached[0] == profile.version:
+        return cached[1]
+    category_slugs = connection.execute(
+        select([categories.c.id, categories.c.slug])).fetchall()
+    text = render_robots_txt(profile, category_slugs, robots_paths())
+    backend.set('robots', (profile.version, text))
+    return text
@@ -0,0 +1,192 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+
+import time
+
+from pylons import config
+from sqlalchemy import select
+
+from mediacore.model.meta import DBSession
+from mediacore.model.settings import Setting, settings as settings_table
+
+from mediacoreext.simplestation.seo.lib.cache import backend_from_config
+from mediacoreext.simplestation.seo.lib.locales import localized_keys
+
+__all__ = [
+    'bump_meta_version_in',
+    'bump_settings_version',
+    'bump_settings_version_in',
+    'get_settings_cache',
+    'LOCALIZED_SETTING_KEYS',
+    'META_VERSION_KEY',
+    'save_settings',
+    'SEOSettingsCache',
+    'SEO_SETTING_KEYS',
+    'SETTINGS_VERSION_KEY',
+]
+
+SEO_SETTING_KEYS = (
+    u'seo_general_meta_description',
+    u'seo_general_meta_keywords',
+    u'seo_explore_page_title',
+    u'seo_explore_meta_description',
+    u'seo_explore_meta_keywords',
+    u'seo_podcast_page_title',
+    u'seo_podcast_meta_description',
+    u'seo_podcast_meta_keywords',
+    u'seo_category_page_title',
+    u'seo_category_meta_description',
+    u'seo_category_meta_keywords',
+    u'seo_upload_page_title',
+    u'seo_upload_meta_description',
+    u'seo_upload_meta_keywords',
+    u'seo_options_noindex_categories',
+    u'seo_options_noindex_rss',
+    u'seo_options_auto_fallbacks',
+)
+
+# settings with a variant per locale, see lib.locales
+LOCALIZED_SETTING_KEYS = tuple(key for key in SEO_SETTING_KEYS
+                               if not key.startswith(u'seo_options_'))
+
+SETTINGS_VERSION_KEY = u'seo_settings_version'
+# bumped whenever the SEO meta of any media item is written
+META_VERSION_KEY = u'seo_meta_version'
+
+
+def fetch_versions():
+    """Return the stored ``(settings version, meta version)`` tuple."""
+    rows = dict(DBSession.query(Setting.key, Setting.value).\
+        filter(Setting.key.in_([SETTINGS_VERSION_KEY, META_VERSION_KEY])))
+    return (int(rows.get(SETTINGS_VERSION_KEY) or 0),
+            int(rows.get(META_VERSION_KEY) or 0))
+
+def bump_settings_version():
+    """Increment the SEO settings version as part of the current transaction.
+
+    The row is locked until the transaction ends so concurrent saves can not
+    end up with the same version.
+
+    """
+    setting = Setting.query.filter(Setting.key == SETTINGS_VERSION_KEY).\
+        with_lockmode('update').\
+        first()
+    if setting is None:
+        setting = Setting(SETTINGS_VERSION_KEY, u'0')
+        DBSession.add(setting)
+    setting.value = unicode(int(setting.value or 0) + 1)
+    return int(setting.value)
+
+def bump_settings_version_in(connection, key=SETTINGS_VERSION_KEY):
+    """Increment the SEO settings version using the given connection.
+
+    Same as :func:`bump_settings_version` but without the ORM session, so
+    it can be used in mapper events during a flush.
+
+    """
+    query = select([settings_table.c.id, settings_table.c.value],
+                   settings_table.c.key == key,
+                   for_update=True)
+    row = connection.execute(query).first()
+    if row is None:
+        connection.execute(settings_table.insert().
+            values(key=key, value=u'1'))
+        return 1
+    version = int(row[1] or 0) + 1
+    connection.execute(settings_table.update().
+        where(settings_table.c.id == row[0]).
+        values(value=unicode(version)))
+    return version
+
+def bump_meta_version_in(connection):
+    """Increment the SEO meta version, which invalidates the cached page
+    values of all media in every worker."""
+    return bump_settings_version_in(connection, META_VERSION_KEY)
+
+def save_settings(values):
+    """Store the given settings, rows which do not exist yet are created.
+
+    Used for the locale specific settings which (unlike the regular ones)
+    are not inserted by a migration.
+
+    """
+    existing = dict(DBSession.query(Setting.key, Setting).\
+        filter(Setting.key.in_(list(values))))
+    for key, value in values.iteritems():
+        setting = existing.get(key)
+        if setting is None:
+            DBSession.add(Setting(key, value or u''))
+        else:
+            setting.value = value or u''
+
+def fetch_settings():
+    """Load all SEO settings (of all locales) with a single query."""
+    keys = SEO_SETTING_KEYS + localized_keys(LOCALIZED_SETTING_KEYS)
+    rows = DBSession.query(Setting.key, Setting.value).\
+        filter(Setting.key.in_(keys))
+    return dict(rows)
+
+
+class SEOSettingsCache(object):
+    """Version-stamped cache for the SEO settings.
+
+    Each worker keeps the settings it loaded last together with their
+    version. At most once every ``check_interval`` seconds the version
+    number is read from the database; only if it changed the settings are
+    taken from the shared backend or, failing that, from the database.
+    The SEO meta version is read with the same query and kept as
+    :attr:`meta_version`.
+
+    :param backend: A cache backend from :mod:`.cache` shared by workers.
+    :param check_interval: Seconds between two version checks.
+
+    """
+
+    cache_key = 'settings'
+
+    def __init__(self, backend, check_interval=1.0):
+        self.backend = backend
+        self.check_interval = check_interval
+        self.version = None
+        self.meta_version = None
+        self.settings = None
+        self._next_check = 0
+
+    def get(self):
+        """Return a ``(version, settings)`` tuple with up-to-date values."""
+        now = time.time()
+        if self.settings is not None and now < self._next_check:
+            return self.version, self.settings
+        version, self.meta_version = fetch_versions()
+        self._next_check = now + self.check_interval
+        if self.settings is None or version != self.version:
+            self.settings = self._load(version)
+            self.version = version
+        return self.version, self.settings
+
+    def _load(self, version):
+        cached = self.backend.get(self.cache_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        settings = fetch_settings()
+        self.backend.set(self.cache_key, (version, settings))
+        return settings
+
+    def invalidate(self):
+        """Force a version check on the next call to :meth:`get`."""
+        self._next_check = 0
+
+
+_settings_cache = None
+
+def get_settings_cache():
+    """Return the :class:`SEOSettingsCache` of this worker."""
+    global _settings_cache
+    if _settings_cache is None:
+        _settings_cache = SEOSettingsCache(backend_from_config(config),
+            check_interval=float(config.get('seo.settings_check_interval', 1.0)))
+    return _settings_cache
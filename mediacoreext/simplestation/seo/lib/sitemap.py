@@ -0,0 +1,187 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Streaming XML sitemaps for all published media.
+
+Media URLs are split into shards by media id, each shard covering a range
+of :data:`SHARD_SIZE` ids (the URL limit of the sitemap protocol). Keeping
+shard boundaries fixed means a changed media item always ends up in the
+same shard, so prebuilt shards can be updated one by one.
+All functions work on a plain SQLAlchemy connection and yield the XML in
+chunks so that memory usage does not depend on the size of the catalogue.
+"""
+
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from sqlalchemy import and_, func, or_, select
+
+from mediacore.lib.helpers import thumb_url, url_for
+from mediacore.model.categories import categories
+from mediacore.model.media import media, media_meta
+
+__all__ = [
+    'category_entries',
+    'count_media_shards',
+    'media_shard_entries',
+    'published_media_clause',
+    'render_sitemap_index',
+    'render_urlset',
+    'shard_of',
+    'SHARD_SIZE',
+    'sitemap_urls',
+]
+
+SHARD_SIZE = 50000
+CHUNK_SIZE = 500
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+VIDEO_NS = 'http://www.google.com/schemas/sitemap-video/1.1'
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def url_template(url, placeholder):
+    """Turn a URL generated for a placeholder into a fast string builder.
+
+    Routes can not be used once the response body is streamed because the
+    request has already finished by then, so URLs are generated up front.
+
+    """
+    prefix, suffix = url.split(placeholder, 1)
+    return lambda value: u'%s%s%s' % (prefix, value, suffix)
+
+def sitemap_urls():
+    """Return a dict of callables building the absolute URLs of a sitemap.
+
+    'media' and 'category' take a slug, 'thumb' takes a media id and
+    'shard' and 'snapshot' take the name of a sitemap shard.
+
+    """
+    return {
+        'media': url_template(url_for(controller='/media', action='view',
+            slug='SEOSLUG', qualified=True), 'SEOSLUG'),
+        'category': url_template(url_for(controller='/categories',
+            action='index', slug='SEOSLUG', qualified=True), 'SEOSLUG'),
+        'thumb': url_template(thumb_url(('media', 'SEOID'), 'l',
+            qualified=True), 'SEOID'),
+        'shard': url_template(url_for(controller='/seo/sitemaps',
+            action='shard', id='SEOID', qualified=True), 'SEOID'),
+        'snapshot': url_template(url_for(controller='/seo/sitemaps',
+            action='snapshot', id='SEOID', qualified=True), 'SEOID'),
+    }
+
+def published_media_clause(now=None):
+    """SQL clause matching what ``Media.query.published()`` returns."""
+    if now is None:
+        now = datetime.now()
+    return and_(
+        media.c.reviewed == True,
+        media.c.encoded == True,
+        media.c.publishable == True,
+        media.c.publish_on <= now,
+        or_(media.c.publish_until == None, media.c.publish_until >= now),
+    )
+
+def count_media_shards(connection, shard_size=SHARD_SIZE):
+    """Return the number of media shards needed for all published media."""
+    query = select([func.max(media.c.id)], published_media_clause())
+    max_id = connection.execute(query).scalar() or 0
+    return shard_of(max_id, shard_size) + 1
+
+def shard_of(media_id, shard_size=SHARD_SIZE):
+    """Return the number of the shard the given media id belongs to."""
+    return media_id // shard_size
+
+def media_shard_entries(connection, shard, shard_size=SHARD_SIZE):
+    """Yield one dict per published media item in the given shard.
+
+    The SEO page title and meta description are joined in the same query
+    and take precedence over the media title and plain text description.
+
+    """
+    seo_title = media_meta.alias('seo_title')
+    seo_desc = media_meta.alias('seo_desc')
+    joined = media.\
+        outerjoin(seo_title, and_(seo_title.c.media_id == media.c.id,
+                                  seo_title.c.key == u'seo_page_title')).\
+        outerjoin(seo_desc, and_(seo_desc.c.media_id == media.c.id,
+                                 seo_desc.c.key == u'seo_meta_description'))
+    in_shard = and_(media.c.id >= shard * shard_size,
+                    media.c.id < (shard + 1) * shard_size)
+    query = select([media.c.id, media.c.slug, media.c.title,
+                    media.c.description_plain, media.c.modified_on,
+                    seo_title.c.value, seo_desc.c.value],
+                   and_(published_media_clause(), in_shard),
+                   from_obj=[joined]).\
+        order_by(media.c.id)
+    result = connection.execution_options(stream_results=True).execute(query)
+    for id, slug, title, description, modified_on, page_title, meta_desc in result:
+        yield {
+            'id': id,
+            'slug': slug,
+            'title': page_title or title,
+            'description': meta_desc or description,
+            'lastmod': modified_on,
+        }
+
+def category_entries(connection, indexed=None):
+    """Yield one dict per category.
+
+    :param indexed: Optional callable taking a category id. Categories for
+        which it returns False are noindex and left out, e.g.
+        ``lambda category_id: profile.resolve_category(category_id)['robots']``.
+
+    """
+    query = select([categories.c.id, categories.c.slug]).\
+        order_by(categories.c.id)
+    for id, slug in connection.execute(query):
+        if indexed is None or indexed(id):
+            yield {'id': id, 'slug': slug, 'lastmod': None}
+
+def _url_xml(loc, entry, thumb_url):
+    parts = ['<url><loc>%s</loc>' % escape(loc)]
+    if entry.get('lastmod'):
+        parts.append('<lastmod>%s</lastmod>' % entry['lastmod'].strftime('%Y-%m-%d'))
+    if thumb_url is not None and entry.get('title'):
+        parts.append('<video:video>')
+        parts.append('<video:thumbnail_loc>%s</video:thumbnail_loc>'
+                     % escape(thumb_url(entry['id'])))
+        parts.append('<video:title>%s</video:title>' % escape(entry['title'][:100]))
+        parts.append('<video:description>%s</video:description>'
+                     % escape((entry.get('description') or entry['title'])[:2048]))
+        parts.append('<video:player_loc>%s</video:player_loc>' % escape(loc))
+        parts.append('</video:video>')
+    parts.append('</url>\n')
+    return u''.join(parts)
+
+def render_urlset(entries, url, thumb_url=None, chunk_size=CHUNK_SIZE):
+    """Yield the UTF-8 encoded ``<urlset>`` document for the given entries.
+
+    :param entries: An iterable of dicts as returned by
+        :func:`media_shard_entries` or :func:`category_entries`.
+    :param url: A callable returning the absolute URL for an entry's slug.
+    :param thumb_url: Optional callable returning the thumbnail URL for an
+        entry's id. If given, Google video extension tags are emitted.
+
+    """
+    yield XML_HEADER + '<urlset xmlns="%s" xmlns:video="%s">\n' % (SITEMAP_NS, VIDEO_NS)
+    chunk = []
+    for entry in entries:
+        chunk.append(_url_xml(url(entry['slug']), entry, thumb_url))
+        if len(chunk) >= chunk_size:
+            yield u''.join(chunk).encode('utf-8')
+            chunk = []
+    if chunk:
+        yield u''.join(chunk).encode('utf-8')
+    yield '</urlset>\n'
+
+def render_sitemap_index(locs):
+    """Yield the ``<sitemapindex>`` document listing the given URLs."""
+    yield XML_HEADER + '<sitemapindex xmlns="%s">\n' % SITEMAP_NS
+    for loc in locs:
+        yield (u'<sitemap><loc>%s</loc></sitemap>\n' % escape(loc)).encode('utf-8')
+    yield '</sitemapindex>\n'
@@ -0,0 +1,218 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Prebuilt, gzip-compressed sitemap snapshots on disk.
+
+A full build writes every shard. Later builds only rewrite the shards which
+contain media saved or deleted (recorded by :func:`queue_dirty_media` once
+the transaction is committed) or media whose modification or publishing
+dates changed since the previous build.
+"""
+
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from pylons import config
+from sqlalchemy import and_, or_, select
+
+from mediacore.model.media import media
+
+from mediacoreext.simplestation.seo.lib.after_commit import AfterCommitBuffer
+from mediacoreext.simplestation.seo.lib.sitemap import (category_entries,
+    count_media_shards, media_shard_entries, render_sitemap_index,
+    render_urlset, shard_of)
+
+__all__ = [
+    'get_sitemap_snapshot',
+    'mark_deleted_media',
+    'queue_dirty_media',
+    'SitemapSnapshot',
+]
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+class SitemapSnapshot(object):
+    """The sitemap files kept in one directory.
+
+    :param directory: Where the sitemap files are written to.
+
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'sitemap.xml')
+        self.state_path = os.path.join(directory, 'state.json')
+        self.dirty_path = os.path.join(directory, 'dirty')
+
+    def shard_path(self, name):
+        return os.path.join(self.directory, 'sitemap-%s.xml.gz' % name)
+
+    def mark_dirty(self, media_ids):
+        """Record media ids whose shards must be rebuilt by the next build.
+
+        Each id is appended as a single line, so concurrent writers from
+        several worker processes do not garble each other's data.
+
+        """
+        if not os.path.isdir(self.directory):
+            return
+        with open(self.dirty_path, 'a') as fp:
+            fp.write(''.join('%d\n' % media_id for media_id in media_ids))
+
+    # the interface of AfterCommitBuffer
+    add = mark_dirty
+
+    def _take_dirty_ids(self):
+        """Move the recorded ids to the processing file and return all of it.
+
+        Ids left in the processing file by a build which failed are kept,
+        the file is only removed once a build succeeded.
+
+        """
+        processing_path = self.dirty_path + '.processing'
+        if os.path.exists(self.dirty_path):
+            # renamed first, so ids recorded meanwhile go to a new file
+            taken_path = '%s.%d' % (self.dirty_path, os.getpid())
+            os.rename(self.dirty_path, taken_path)
+            with open(taken_path) as taken:
+                with open(processing_path, 'a') as fp:
+                    fp.write(taken.read())
+            os.remove(taken_path)
+        if not os.path.exists(processing_path):
+            return set(), None
+        with open(processing_path) as fp:
+            ids = set(int(line) for line in fp if line.strip())
+        return ids, processing_path
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as fp:
+                state = json.load(fp)
+        except (IOError, ValueError):
+            return None
+        state['built_at'] = datetime.strptime(state['built_at'], DATE_FORMAT)
+        return state
+
+    def _save_state(self, built_at, shards):
+        state = {'built_at': built_at.strftime(DATE_FORMAT), 'shards': shards}
+        self._write(self.state_path, [json.dumps(state)])
+
+    def _write(self, path, chunks, compress=False):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as fp:
+            if compress:
+                fp = gzip.GzipFile(fileobj=fp, mode='wb')
+            for chunk in chunks:
+                fp.write(chunk)
+            fp.close()
+        # mkstemp creates files readable by the owner only
+        os.chmod(tmp_path, 0o644)
+        os.rename(tmp_path, path)
+
+    def changed_shards(self, connection, since, media_ids=()):
+        """Return the numbers of all shards which changed after ``since``."""
+        now = datetime.now()
+        changed = or_(
+            media.c.modified_on > since,
+            and_(media.c.publish_on > since, media.c.publish_on <= now),
+            and_(media.c.publish_until > since, media.c.publish_until <= now),
+        )
+        query = select([media.c.id], changed)
+        shards = set(shard_of(media_id) for media_id in media_ids)
+        for (media_id,) in connection.execute(query):
+            shards.add(shard_of(media_id))
+        return shards
+
+    def build(self, connection, urls, include_categories=True, full=False,
+              indexed_category=None):
+        """Write all changed sitemap shards and the sitemap index.
+
+        :param connection: A SQLAlchemy connection.
+        :param urls: The URL builders as returned by
+            :func:`~mediacoreext.simplestation.seo.lib.sitemap.sitemap_urls`.
+        :param include_categories: Write a shard with all category pages.
+        :param full: Rewrite all shards even if they did not change.
+        :param indexed_category: Leaves out noindex categories, see
+            :func:`~mediacoreext.simplestation.seo.lib.sitemap.category_entries`.
+        :returns: The sorted list of rewritten media shards.
+        :rtype: list
+
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        started = datetime.now()
+        dirty_ids, processing_path = self._take_dirty_ids()
+        state = self.load_state()
+        shard_count = count_media_shards(connection)
+
+        if full or state is None:
+            shards = set(range(shard_count))
+        else:
+            shards = self.changed_shards(connection, state['built_at'], dirty_ids)
+            shards.update(range(state['shards'], shard_count))
+            for shard in range(shard_count, state['shards']):
+                if os.path.exists(self.shard_path(shard)):
+                    os.remove(self.shard_path(shard))
+        shards = sorted(shard for shard in shards if shard < shard_count)
+
+        for shard in shards:
+            self._write(self.shard_path(shard),
+                render_urlset(media_shard_entries(connection, shard),
+                              urls['media'], urls['thumb']),
+                compress=True)
+        locs = [urls['snapshot'](shard) for shard in range(shard_count)]
+        categories_path = self.shard_path('categories')
+        if include_categories:
+            self._write(categories_path,
+                render_urlset(category_entries(connection, indexed_category),
+                              urls['category']),
+                compress=True)
+            locs.append(urls['snapshot']('categories'))
+        elif os.path.exists(categories_path):
+            os.remove(categories_path)
+        self._write(self.index_path, render_sitemap_index(locs))
+
+        self._save_state(started, shard_count)
+        if processing_path is not None:
+            os.remove(processing_path)
+        return shards
+
+
+def get_sitemap_snapshot():
+    """Return the :class:`SitemapSnapshot` configured by ``seo.sitemap_dir``.
+
+    :returns: None if no sitemap directory was configured.
+
+    """
+    directory = config.get('seo.sitemap_dir')
+    if not directory:
+        return None
+    return SitemapSnapshot(directory)
+
+_pending_dirty = AfterCommitBuffer(get_sitemap_snapshot)
+
+def queue_dirty_media(media_ids):
+    """Mark the media dirty once the current transaction is committed.
+
+    Marking them earlier would let a build running before the commit
+    rewrite their shards with the old rows and forget about them.
+
+    """
+    _pending_dirty.add(media_ids)
+
+def mark_deleted_media(mapper, connection, target):
+    """Rebuild the shard of a deleted media item.
+
+    Listens for the ``after_delete`` event of
+    :class:`~mediacore.model.media.Media`; the deleted row does not show
+    up in the date based change detection of the next build.
+
+    """
+    queue_dirty_media([target.id])
@@ -0,0 +1,121 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Open Graph and Twitter Card tags.
+
+The tags use the same title and description as the page's regular meta
+tags. URL, size and MIME type of a media thumbnail are determined when the
+media item (or its thumbnail) is saved and stored as ``seo_og_image`` meta,
+so rendering a page never touches the image file.
+"""
+
+import json
+import logging
+
+from genshi.core import escape
+from pylons import config
+
+from mediacore.lib.thumbnails import thumb_path, thumb_url
+
+__all__ = [
+    'media_image_details',
+    'probe_image',
+    'SOCIAL_IMAGE_META_KEY',
+    'social_tags',
+]
+
+log = logging.getLogger(__name__)
+
+SOCIAL_IMAGE_META_KEY = u'seo_og_image'
+
+THUMB_SIZE = 'l'
+
+def probe_image(path):
+    """Return ``(width, height, mime_type)`` of an image file or None.
+
+    PIL only reads the image header here, the image data is not decoded.
+    Besides IOError PIL raises e.g. ValueError, SyntaxError or struct.error
+    for truncated or corrupt files; saving the media item must not fail
+    because of them.
+
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        import Image
+    try:
+        image = Image.open(path)
+        width, height = image.size
+        return width, height, Image.MIME.get(image.format)
+    except Exception as e:
+        log.warning('Could not probe the image %s: %s', path, e)
+        return None
+
+def media_image_details(item):
+    """Return the JSON string with the thumbnail details of a media item.
+
+    If the thumbnail can not be probed the configured thumbnail size is
+    used.
+
+    :param item: A :class:`~mediacore.model.media.Media` instance
+    :rtype: unicode or None
+
+    """
+    path = thumb_path(item, THUMB_SIZE, exists=True)
+    if path is None:
+        return None
+    probed = probe_image(path)
+    if probed is None:
+        width, height = config['thumb_sizes']['media'][THUMB_SIZE]
+        probed = (width, height, 'image/jpeg')
+    width, height, mime_type = probed
+    return unicode(json.dumps({
+        'url': thumb_url(item, THUMB_SIZE, qualified=True),
+        'width': width,
+        'height': height,
+        'type': mime_type,
+    }, sort_keys=True))
+
+def _tag(attribute, name, content):
+    return u'<meta %s="%s" content="%s" />' % (attribute, name,
+        escape(unicode(content), quote=True))
+
+def social_tags(values, url, og_type='website', image=None, site_name=None):
+    """Return the Open Graph and Twitter Card ``<meta>`` tags of a page.
+
+    :param values: The page values as returned by
+        :func:`~mediacoreext.simplestation.seo.lib.resolver.resolve_page`.
+    :param url: The absolute URL of the page.
+    :param og_type: The Open Graph type, e.g. 'video.other'.
+    :param image: The stored JSON string of :func:`media_image_details`.
+    :param site_name: The site name shown by social networks.
+    :rtype: unicode
+
+    """
+    tags = [
+        _tag('property', 'og:type', og_type),
+        _tag('property', 'og:url', url),
+    ]
+    if site_name:
+        tags.append(_tag('property', 'og:site_name', site_name))
+    if values['title']:
+        tags.append(_tag('property', 'og:title', values['title']))
+        tags.append(_tag('name', 'twitter:title', values['title']))
+    if values['description']:
+        tags.append(_tag('property', 'og:description', values['description']))
+        tags.append(_tag('name', 'twitter:description', values['description']))
+    details = image and json.loads(image)
+    if details:
+        tags.append(_tag('property', 'og:image', details['url']))
+        tags.append(_tag('property', 'og:image:width', details['width']))
+        tags.append(_tag('property', 'og:image:height', details['height']))
+        if details['type']:
+            tags.append(_tag('property', 'og:image:type', details['type']))
+        tags.append(_tag('name', 'twitter:card', 'summary_large_image'))
+        tags.append(_tag('name', 'twitter:image', details['url']))
+    else:
+        tags.append(_tag('name', 'twitter:card', 'summary'))
+    return u'\n'.join(tags)
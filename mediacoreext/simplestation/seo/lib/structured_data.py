@@ -0,0 +1,188 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""schema.org VideoObject descriptions (JSON-LD) for media pages.
+
+The JSON-LD ``<script>`` tag is serialized when a media item is saved and
+stored as ``seo_jsonld`` meta. The media view page just inserts the stored
+string. :func:`refresh_media_jsonld` keeps it up to date when the media
+details change outside of the SEO form, e.g. when a media item is published.
+"""
+
+import json
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm.attributes import get_history
+
+from mediacore.model.media import media, media_meta
+
+from mediacoreext.simplestation.seo.lib.batches import chunks
+from mediacoreext.simplestation.seo.lib.fallbacks import make_description
+from mediacoreext.simplestation.seo.lib.sitemap import sitemap_urls
+
+__all__ = [
+    'details_jsonld',
+    'fetch_media_details',
+    'JSONLD_META_KEY',
+    'JSONLD_SOURCE_KEYS',
+    'jsonld_script',
+    'media_details',
+    'media_jsonld',
+    'refresh_media_jsonld',
+    'structured_data_rows',
+    'video_object',
+]
+
+JSONLD_META_KEY = u'seo_jsonld'
+# the meta values read by details_jsonld()
+JSONLD_SOURCE_KEYS = (u'seo_page_title', u'seo_meta_description',
+    u'seo_meta_keywords', u'seo_auto_meta_description',
+    u'seo_auto_meta_keywords')
+# the Media attributes used by media_details()
+DETAIL_ATTRIBUTES = ('slug', 'title', 'description_plain', 'publish_on',
+                     'duration')
+
+def iso_duration(seconds):
+    """Return the ISO 8601 duration for the given number of seconds."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return 'PT%dH%dM%dS' % (hours, minutes, seconds)
+
+def video_object(details, urls):
+    """Return the VideoObject for a media item as a dict.
+
+    :param details: A dict with the keys 'id', 'slug', 'title',
+        'description' (plain text), 'publish_on', 'duration' and the
+        ``seo_*`` meta values 'page_title', 'meta_description' and
+        'meta_keywords' (which may be None).
+    :param urls: URL builders as returned by
+        :func:`~mediacoreext.simplestation.seo.lib.sitemap.sitemap_urls`.
+
+    """
+    data = {
+        '@context': 'http://schema.org',
+        '@type': 'VideoObject',
+        'name': details['page_title'] or details['title'],
+        'description': details['meta_description']
+            or make_description(details['title'], details['description']),
+        'url': urls['media'](details['slug']),
+        'thumbnailUrl': urls['thumb'](details['id']),
+    }
+    if details['publish_on']:
+        data['uploadDate'] = details['publish_on'].isoformat()
+    if details['duration']:
+        data['duration'] = iso_duration(details['duration'])
+    if details['meta_keywords']:
+        data['keywords'] = details['meta_keywords']
+    return data
+
+def jsonld_script(data):
+    """Serialize the given data into a JSON-LD ``<script>`` tag."""
+    # '</' must not appear inside of a script element
+    payload = json.dumps(data, sort_keys=True).replace('</', '<\\/')
+    return u'<script type="application/ld+json">%s</script>' % payload
+
+DETAIL_KEYS = ('id', 'slug', 'title', 'description', 'publish_on', 'duration')
+
+def _detail_columns():
+    return [media.c.id, media.c.slug, media.c.title, media.c.description_plain,
+            media.c.publish_on, media.c.duration]
+
+def media_details(item):
+    """Return the media details needed by :func:`video_object`."""
+    return {
+        'id': item.id,
+        'slug': item.slug,
+        'title': item.title,
+        'description': item.description_plain,
+        'publish_on': item.publish_on,
+        'duration': item.duration,
+    }
+
+def fetch_media_details(connection, media_ids):
+    """Like :func:`media_details` for many media ids, without loading
+    Media instances.
+
+    :returns: A dict mapping the media ids to their details.
+
+    """
+    details = {}
+    for chunk in chunks(media_ids):
+        query = select(_detail_columns(), media.c.id.in_(chunk))
+        for row in connection.execute(query):
+            details[row[0]] = dict(zip(DETAIL_KEYS, row))
+    return details
+
+def media_jsonld(item, values, urls):
+    """Return the JSON-LD script tag for a media item which is being saved.
+
+    :param item: A :class:`~mediacore.model.media.Media` instance
+    :param values: A dict of the new ``seo_*`` meta values of the item
+    :param urls: URL builders, see :func:`video_object`
+
+    """
+    return details_jsonld(media_details(item), values, urls)
+
+def details_jsonld(details, values, urls):
+    """Return the JSON-LD script tag for the given media details, see
+    :func:`media_jsonld`."""
+    return jsonld_script(video_object(dict(details,
+        page_title=values.get(u'seo_page_title'),
+        meta_description=values.get(u'seo_meta_description') \
+            or values.get(u'seo_auto_meta_description'),
+        meta_keywords=values.get(u'seo_meta_keywords') \
+            or values.get(u'seo_auto_meta_keywords'),
+    ), urls))
+
+def structured_data_rows(connection, media_ids):
+    """Return ``(details, values)`` for the given media, the arguments of
+    :func:`details_jsonld` without the URLs."""
+    aliases = [media_meta.alias() for key in JSONLD_SOURCE_KEYS]
+    joined = media
+    for key, alias in zip(JSONLD_SOURCE_KEYS, aliases):
+        joined = joined.outerjoin(alias, and_(alias.c.media_id == media.c.id,
+                                              alias.c.key == key))
+    query = select(_detail_columns() + [alias.c.value for alias in aliases],
+                   media.c.id.in_(media_ids), from_obj=[joined]).\
+        order_by(media.c.id)
+    rows = []
+    for row in connection.execute(query):
+        details = dict(zip(DETAIL_KEYS, row[:len(DETAIL_KEYS)]))
+        values = dict(zip(JSONLD_SOURCE_KEYS, row[len(DETAIL_KEYS):]))
+        rows.append((details, values))
+    return rows
+
+def refresh_media_jsonld(mapper, connection, target):
+    """Rebuild the stored JSON-LD after the details of a media item changed.
+
+    Listens for the ``after_update`` event of
+    :class:`~mediacore.model.media.Media`. Only media which have stored
+    JSON-LD already are updated. Outside of a request (and of commands
+    which set up URL generation) the URLs can not be built and the stored
+    value is left for the structured data command.
+
+    """
+    if not any(get_history(target, name).has_changes()
+               for name in DETAIL_ATTRIBUTES):
+        return
+    query = select([media_meta.c.key, media_meta.c.value],
+                   and_(media_meta.c.media_id == target.id,
+                        media_meta.c.key.in_(JSONLD_SOURCE_KEYS +
+                                             (JSONLD_META_KEY,))))
+    values = dict(connection.execute(query).fetchall())
+    if JSONLD_META_KEY not in values:
+        return
+    try:
+        urls = sitemap_urls()
+    except TypeError:
+        # no URL generator
+        return
+    script = details_jsonld(media_details(target), values, urls)
+    if script != values[JSONLD_META_KEY]:
+        connection.execute(media_meta.update().
+            where(and_(media_meta.c.media_id == target.id,
+                       media_meta.c.key == JSONLD_META_KEY)).
+            values(value=script))
@@ -0,0 +1,180 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Placeholders like ``{media.title} | {category.name} | My Site`` in titles
+and descriptions.
+
+Templates are parsed once when the settings are loaded into the profile.
+Rendering a page just joins the pre-split literal parts with the looked up
+attribute values. Settings without placeholders stay plain strings.
+"""
+
+import re
+
+from mediacoreext.simplestation.seo.lib.fallbacks import (DESCRIPTION_LENGTH,
+    shorten)
+
+__all__ = [
+    'compile_page',
+    'compile_template',
+    'compile_value',
+    'KEYWORDS_LENGTH',
+    'render_values',
+    'shorten_keywords',
+    'TemplateError',
+    'TextTemplate',
+    'TEMPLATE_FIELDS',
+    'TITLE_LENGTH',
+]
+
+TITLE_LENGTH = 70
+KEYWORDS_LENGTH = 255
+
+# the length limit of every value rendered by render_values()
+LENGTH_LIMITS = (
+    ('title', TITLE_LENGTH),
+    ('description', DESCRIPTION_LENGTH),
+    ('keywords', KEYWORDS_LENGTH),
+)
+
+# placeholder name -> attribute of the object passed to the page events
+TEMPLATE_FIELDS = {
+    'media': {
+        'title': 'title',
+        'author': 'author_name',
+        'description': 'description_plain',
+    },
+    'category': {
+        'name': 'name',
+    },
+}
+
+_token_re = re.compile(r'\{\{|\}\}|\{([a-z_]+)\.([a-z_]+)\}|[{}]')
+# separators left behind by empty placeholders, e.g. 'Title |  | Site'
+_separators_re = re.compile(u'(\\s*[|:\u2013\u2014\u00b7-])(?:\\s*[|:\u2013\u2014\u00b7-])+', re.UNICODE)
+_edges_re = re.compile(u'^[\\s|:\u2013\u2014\u00b7-]+|[\\s|:\u2013\u2014\u00b7-]+$', re.UNICODE)
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class TextTemplate(object):
+    """A compiled template, see :func:`compile_template`."""
+
+    def __init__(self, parts, max_length):
+        # literal unicode strings and (variable, attribute) tuples
+        self.parts = tuple(parts)
+        self.max_length = max_length
+
+    def render(self, **context):
+        """Return the text for the given objects or None if it is empty.
+
+        Placeholders for objects which are not given render as an empty
+        string, separators around them are removed.
+
+        """
+        values = []
+        missing = False
+        for part in self.parts:
+            if isinstance(part, tuple):
+                obj = context.get(part[0])
+                value = None
+                if obj is not None and not isinstance(obj, basestring):
+                    value = getattr(obj, part[1], None)
+                missing = missing or not value
+                part = value and unicode(value) or u''
+            values.append(part)
+        text = u''.join(values)
+        if missing:
+            text = _edges_re.sub(u'', _separators_re.sub(r'\1', text))
+        return shorten(text.strip(), self.max_length)
+
+
+def compile_template(text, max_length=TITLE_LENGTH):
+    """Parse a title or description setting.
+
+    :param text: The setting value, ``{{`` and ``}}`` are literal braces.
+    :param max_length: Rendered values are cut to this many characters.
+    :returns: ``text`` if it contains no placeholders, a
+        :class:`TextTemplate` otherwise.
+    :raises TemplateError: For unknown placeholders or unbalanced braces.
+
+    """
+    if not text or (u'{' not in text and u'}' not in text):
+        return text
+    parts = []
+    literal = []
+    position = 0
+    for match in _token_re.finditer(text):
+        literal.append(text[position:match.start()])
+        position = match.end()
+        token = match.group(0)
+        if token in (u'{{', u'}}'):
+            literal.append(token[0])
+            continue
+        name, attribute = match.group(1, 2)
+        fields = TEMPLATE_FIELDS.get(name, {})
+        if attribute not in fields:
+            raise TemplateError('Unknown placeholder %r' % token)
+        if any(literal):
+            parts.append(u''.join(literal))
+            literal = []
+        parts.append((name, fields[attribute]))
+    literal.append(text[position:])
+    if any(literal):
+        parts.append(u''.join(literal))
+    if not any(isinstance(part, tuple) for part in parts):
+        return u''.join(parts)
+    return TextTemplate(parts, max_length)
+
+def compile_value(text, max_length=TITLE_LENGTH):
+    """Like :func:`compile_template` but invalid templates (e.g. saved
+    before templates were supported) are kept as literal strings."""
+    try:
+        return compile_template(text, max_length)
+    except TemplateError:
+        return text
+
+def compile_page(page):
+    """Compile the title and description of a page values dict in place."""
+    page['title'] = compile_value(page['title'], TITLE_LENGTH)
+    page['description'] = compile_value(page['description'], DESCRIPTION_LENGTH)
+    return page
+
+def shorten_keywords(text, length):
+    """Drop the keywords which do not fit into ``length`` characters."""
+    if len(text) <= length:
+        return text
+    head = text[:length + 1]
+    if u',' not in head:
+        return shorten(text, length)
+    return head.rsplit(u',', 1)[0].rstrip(u' ,') or None
+
+def render_values(values, **context):
+    """Return the page values with all templates rendered for the context.
+
+    Plain values, e.g. the ones entered for a media item, are cut to the
+    same lengths as the rendered templates. The given dict is returned
+    unchanged if there is nothing to render or cut.
+
+    """
+    rendered = None
+    for key, max_length in LENGTH_LIMITS:
+        value = values.get(key)
+        if isinstance(value, TextTemplate):
+            value = value.render(**context)
+        elif value and len(value) > max_length:
+            if key == 'keywords':
+                value = shorten_keywords(value, max_length)
+            else:
+                value = shorten(value, max_length)
+        else:
+            continue
+        if rendered is None:
+            rendered = dict(values)
+        rendered[key] = value
+    return rendered or values
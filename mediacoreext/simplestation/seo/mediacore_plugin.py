@@ -5,16 +5,55 @@
 # (at your option) any later version.
 # See LICENSE.txt in the main project directory, for more information.
 
-from pylons import app_globals, tmpl_context
-from tw.forms import ListFieldSet, TextField
+from genshi.core import Markup, escape
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from pylons import app_globals, request, response, tmpl_context
 
 from mediacore.lib.helpers import url_for
 from mediacore.lib.i18n import N_, _
-from mediacore.model import Media
-from mediacore.model.meta import DBSession
+from mediacore.model import Category, Media
 from mediacore.plugin import events
 from mediacore.plugin.events import observes
 
+from mediacoreext.simplestation.seo.lib.after_commit import (discard_after_rollback,
+    send_after_commit)
+from mediacoreext.simplestation.seo.lib.categories import (bump_category_version,
+    bump_category_version_on_update)
+from mediacoreext.simplestation.seo.lib.cdn import (media_key, page_key,
+    queue_purge, SETTINGS_KEY, tag_response)
+from mediacoreext.simplestation.seo.lib.fallbacks import (auto_meta_values,
+    make_description)
+from mediacoreext.simplestation.seo.lib.indexnow import queue_ping
+from mediacoreext.simplestation.seo.lib.instrumentation import (instrumented,
+    instrumentation_enabled)
+from mediacoreext.simplestation.seo.lib.locales import (configured_locales,
+    hreflang_links, localized_key, localized_url, request_locale)
+from mediacoreext.simplestation.seo.lib.media_meta import (get_seo_meta,
+    preload_seo_meta, save_seo_meta)
+from mediacoreext.simplestation.seo.lib.redirects import (get_redirect_index,
+    record_slug_change, release_media_path)
+from mediacoreext.simplestation.seo.lib.resolver import (forget_media_head,
+    get_seo_profile, page_kind, related_media_of, resolve_page, robots_kind)
+from mediacoreext.simplestation.seo.lib.robots import NOINDEX_HEADER
+from mediacoreext.simplestation.seo.lib.sitemap import sitemap_urls
+from mediacoreext.simplestation.seo.lib.sitemap_files import (mark_deleted_media,
+    queue_dirty_media)
+from mediacoreext.simplestation.seo.lib.social import (media_image_details,
+    social_tags, SOCIAL_IMAGE_META_KEY)
+from mediacoreext.simplestation.seo.lib.structured_data import (JSONLD_META_KEY,
+    media_jsonld, refresh_media_jsonld)
+
+event.listen(Media, 'before_update', record_slug_change)
+event.listen(Media, 'after_insert', release_media_path)
+event.listen(Media, 'after_delete', mark_deleted_media)
+event.listen(Media, 'after_update', refresh_media_jsonld)
+event.listen(Category, 'after_insert', bump_category_version)
+event.listen(Category, 'after_update', bump_category_version_on_update)
+event.listen(Category, 'after_delete', bump_category_version)
+event.listen(Session, 'after_commit', send_after_commit)
+event.listen(Session, 'after_rollback', discard_after_rollback)
+
 
 @observes(events.plugin_settings_links)
 def add_settings_link():
@@ -27,6 +66,43 @@ def add_settings_link():
     """
     yield (_('Search Engine Optimization', domain='mediacore_seo'),
            url_for(controller='/seo/admin/settings'))
+    yield (_('Category SEO', domain='mediacore_seo'),
+           url_for(controller='/seo/admin/categories'))
+    yield (_('SEO Audit', domain='mediacore_seo'),
+           url_for(controller='/seo/admin/audit'))
+    yield (_('Bulk Edit Media SEO', domain='mediacore_seo'),
+           url_for(controller='/seo/admin/bulk'))
+    if instrumentation_enabled():
+        yield (_('SEO Plugin Statistics', domain='mediacore_seo'),
+               url_for(controller='/seo/admin/stats'))
+
+
+def match_redirect(environ, match_dict):
+    """Routes condition matching all paths with a stored redirect."""
+    path = environ['PATH_INFO'].decode('utf-8', 'replace')
+    target = get_redirect_index().lookup(path)
+    if target is None:
+        return False
+    match_dict['target'] = target
+    return True
+
+@observes(events.Environment.before_route_setup)
+def add_routes(mapper):
+    """Connect our URLs before MediaCore's own routes.
+
+    The sitemap URLs would otherwise be caught by /sitemap*.xml and the
+    redirect route must be checked before any old URL is dispatched.
+    robots.txt is only effective if the site is served at the root of
+    the domain.
+
+    """
+    mapper.connect('/{path:.*}', controller='seo/redirects', action='follow',
+                   conditions=dict(method=['GET', 'HEAD'], function=match_redirect))
+    mapper.connect('/robots.txt', controller='seo/robots', action='index')
+    mapper.connect('/seo/indexnow-key.txt', controller='seo/indexnow', action='key')
+    mapper.connect('/seo/sitemap.xml', controller='seo/sitemaps', action='index')
+    mapper.connect('/seo/sitemap-{id}.xml', controller='seo/sitemaps', action='shard')
+    mapper.connect('/seo/sitemap-{id}.xml.gz', controller='seo/sitemaps', action='snapshot')
 
 
 @observes(events.Admin.MediaForm)
@@ -41,20 +117,35 @@ def append_fields(form):
     At this point, we can append any fields we like to the form.
 
     In this case we will be adding options to set the page title,
-    meta description and meta keywords for the given media item.
+    meta description and meta keywords for the given media item, once
+    more for every locale configured as ``seo.locales``.
 
     """
+    # tw.forms is only needed in the admin, so workers serving the public
+    # pages never import it.
+    from tw.forms import ListFieldSet, TextField
+    children = [
+        TextField('page_title', label_text=N_('Page Title', domain='mediacore_seo')),
+        TextField('meta_description', label_text=N_('Meta Description', domain='mediacore_seo')),
+        TextField('meta_keywords', label_text=N_('Meta Keywords', domain='mediacore_seo')),
+    ]
+    for locale in configured_locales():
+        children.extend([
+            TextField(localized_key('page_title', locale), help_text=locale,
+                      label_text=N_('Page Title', domain='mediacore_seo')),
+            TextField(localized_key('meta_description', locale), help_text=locale,
+                      label_text=N_('Meta Description', domain='mediacore_seo')),
+            TextField(localized_key('meta_keywords', locale), help_text=locale,
+                      label_text=N_('Meta Keywords', domain='mediacore_seo')),
+        ])
     f = ListFieldSet('seo', suppress_label=True, legend=N_('Media Specifc SEO', domain='mediacore_seo'),
         css_classes=['details_fieldset'],
-        children=[
-            TextField('page_title', label_text=N_('Page Title', domain='mediacore_seo')),
-            TextField('meta_description', label_text=N_('Meta Description', domain='mediacore_seo')),
-            TextField('meta_keywords', label_text=N_('Meta Keywords', domain='mediacore_seo')),
-        ]
+        children=children,
     )
     form.children.append(f)
 
 @observes(events.Admin.MediaController.edit)
+@instrumented
 def populate_fields(**result):
     """Populate SEO fields on Edit Media form.
 
@@ -70,14 +161,19 @@ def populate_fields(**result):
     :rtype: dict
 
     """
-    media = result['media']
+    meta = get_seo_meta(result['media'])
     seo = result['media_values'].setdefault('seo', {})
-    seo.setdefault('page_title', media.meta.get('seo_page_title', None))
-    seo.setdefault('meta_description', media.meta.get('seo_meta_description', None))
-    seo.setdefault('meta_keywords', media.meta.get('seo_meta_keywords', None))
+    seo.setdefault('page_title', meta.get('seo_page_title', None))
+    seo.setdefault('meta_description', meta.get('seo_meta_description', None))
+    seo.setdefault('meta_keywords', meta.get('seo_meta_keywords', None))
+    for locale in configured_locales():
+        for key in ('page_title', 'meta_description', 'meta_keywords'):
+            key = localized_key(key, locale)
+            seo.setdefault(key, meta.get(u'seo_%s' % key, None))
     return result
 
 @observes(events.Admin.MediaController.save)
+@instrumented
 def save_fields(**result):
     """Save SEO settings to the database on a Media item save.
 
@@ -96,16 +192,294 @@ def save_fields(**result):
 
     """
 
-    media = Media.query.get(result['media_id'])
-    for key, value in tmpl_context.form_values['seo'].iteritems():
-        meta_key = u'seo_%s' % key
-        if value:
-            media.meta[meta_key] = value
-        elif meta_key in media.meta:
-            DBSession.delete(media._meta[meta_key])
+    media = result.get('media')
+    if media is None:
+        # Query.get() is answered from the session's identity map when
+        # the controller already loaded the media item.
+        media = Media.query.get(result['media_id'])
+    values = dict((u'seo_%s' % key, value)
+                  for key, value in tmpl_context.form_values['seo'].iteritems())
+    if get_seo_profile().auto_fallbacks:
+        values.update(auto_meta_values(media.title, media.description_plain,
+                                       [tag.name for tag in media.tags]))
+    values[JSONLD_META_KEY] = media_jsonld(media, values, sitemap_urls())
+    values[SOCIAL_IMAGE_META_KEY] = media_image_details(media)
+    save_seo_meta(media, values)
+    forget_media_head(media.id)
+    queue_purge([media_key(media.id)])
+    return result
+
+@observes(events.Admin.MediaController.save)
+def queue_indexnow_ping(**result):
+    """Let search engines know about the saved media item.
+
+    Only published media are announced. The URL is queued once the save
+    is committed; a background thread submits it after a short delay,
+    together with other changed URLs.
+
+    """
+    if result.get('media_id'):
+        media = Media.query.get(result['media_id'])
+        if media.is_published:
+            queue_ping([url_for(controller='/media', action='view',
+                                slug=media.slug, qualified=True)])
+    return result
+
+@observes(events.Admin.MediaController.save_thumb)
+def save_social_image(**result):
+    """Store the details of a newly uploaded thumbnail for social tags."""
+    if result.get('success') and result.get('id'):
+        media = Media.query.get(result['id'])
+        save_seo_meta(media, {
+            SOCIAL_IMAGE_META_KEY: media_image_details(media),
+        })
+        forget_media_head(media.id)
+        queue_purge([media_key(media.id)])
+    return result
+
+@observes(events.Admin.MediaController.save)
+def mark_sitemap_dirty(**result):
+    """Queue the saved media item for the next incremental sitemap build."""
+    if result.get('media_id'):
+        queue_dirty_media([result['media_id']])
+    return result
+
+@observes(events.MediaController.index)
+@observes(events.MediaController.explore)
+@observes(events.CategoriesController.index)
+@observes(events.PodcastsController.view)
+@observes(events.PodcastsController.feed)
+@observes(events.SitemapsController.mrss)
+@observes(events.SitemapsController.latest)
+@observes(events.SitemapsController.featured)
+@instrumented
+def preload_listing_fields(**result):
+    """Preload the SEO meta of all media items listed on a page or feed.
+
+    Listing pages and feeds render many media items and each of them
+    triggers our page_title/meta_* observers. Loading the SEO values of
+    all items in one go avoids a separate meta query per item.
+
+    Lists and the items of paginated pages are preloaded. Unevaluated
+    queries are left alone: they are not sliced to a page yet and the
+    template may still call ``count()`` or slice them.
+
+    :param result: A dict of values returned by the controller action
+    :param type: dict
+    :returns: The unchanged dict
+    :rtype: dict
+
+    """
+    media = []
+    for value in result.itervalues():
+        if isinstance(getattr(value, 'items', None), list):
+            # a webhelpers.paginate.Page
+            value = value.items
+        if isinstance(value, (list, tuple)):
+            media.extend(item for item in value if isinstance(item, Media))
+    if media:
+        preload_seo_meta(media)
+    return result
+
+@observes(events.MediaController.view)
+def add_media_surrogate_keys(**result):
+    """Tag media pages with surrogate keys for the CDN.
+
+    Saving SEO values purges the keys of the affected pages, see
+    :mod:`~mediacoreext.simplestation.seo.lib.cdn`.
+
+    :param result: A dict of values returned by the controller action
+    :param type: dict
+    :returns: The unchanged dict
+    :rtype: dict
+
+    """
+    tag_response([media_key(result['media'].id), SETTINGS_KEY])
+    return result
+
+@observes(events.MediaController.explore)
+def add_explore_surrogate_keys(**result):
+    """Tag the explore page with surrogate keys for the CDN."""
+    tag_response([page_key('explore'), SETTINGS_KEY])
+    return result
+
+@observes(events.PodcastsController.index)
+@observes(events.PodcastsController.view)
+def add_podcast_surrogate_keys(**result):
+    """Tag podcast pages with surrogate keys for the CDN."""
+    tag_response([page_key('podcast'), SETTINGS_KEY])
+    return result
+
+@observes(events.CategoriesController.index)
+def add_category_surrogate_keys(**result):
+    """Tag category pages with surrogate keys for the CDN."""
+    tag_response([page_key('category'), SETTINGS_KEY])
+    return result
+
+@observes(events.UploadController.index)
+def add_upload_surrogate_keys(**result):
+    """Tag the upload page with surrogate keys for the CDN."""
+    tag_response([page_key('upload'), SETTINGS_KEY])
+    return result
+
+@observes(events.CategoriesController.index)
+def add_category_robots_header(**result):
+    """Send an X-Robots-Tag header for category pages which are not indexed.
+
+    :param result: A dict of values returned by the controller action
+    :param type: dict
+    :returns: The unchanged dict
+    :rtype: dict
+
+    """
+    category = result.get('category') or 'all'
+    if not resolve_page('category', category=category)['robots']:
+        response.headers['X-Robots-Tag'] = NOINDEX_HEADER
+    return result
+
+@observes(events.CategoriesController.feed)
+@observes(events.PodcastsController.feed)
+@observes(events.SitemapsController.mrss)
+@observes(events.SitemapsController.latest)
+@observes(events.SitemapsController.featured)
+def add_feed_robots_header(**result):
+    """Send an X-Robots-Tag header for feeds if RSS is not indexed."""
+    if get_seo_profile().noindex_rss:
+        response.headers['X-Robots-Tag'] = NOINDEX_HEADER
+    return result
+
+def _resolve(category=None, media=None, podcast=None, upload=None):
+    return resolve_page(page_kind(category, media, podcast, upload), media,
+                        category)
+
+@observes(events.MediaController.view)
+def add_structured_data(**result):
+    """Pass the stored JSON-LD description of the media to the template.
+
+    The ``<script>`` tag was serialized when the media item was saved and
+    is available as ``seo_structured_data`` in the media view template,
+    which should output it with ``${seo_structured_data}``.
+
+    :param result: A dict of values returned by the controller action
+    :param type: dict
+    :returns: The dict with our additional template variable
+    :rtype: dict
+
+    """
+    jsonld = get_seo_meta(result['media']).get(JSONLD_META_KEY)
+    result['seo_structured_data'] = jsonld and Markup(jsonld) or u''
+    return result
+
+@observes(events.MediaController.view)
+def add_related_media(**result):
+    """Pass media sharing SEO keywords with this one to the template.
+
+    ``seo_related_media`` is a list of ``(id, slug, title, shared)``
+    tuples for building internal links, see
+    :func:`~mediacoreext.simplestation.seo.lib.keywords.related_media`.
+
+    :param result: A dict of values returned by the controller action
+    :param type: dict
+    :returns: The dict with our additional template variable
+    :rtype: dict
+
+    """
+    result['seo_related_media'] = related_media_of(result['media'])
+    return result
+
+@observes(events.MediaController.view)
+def add_canonical_link(**result):
+    """Pass a ``<link rel="canonical">`` tag to the media view template.
+
+    The tag is available as ``seo_canonical_link`` and always points to the
+    current slug of the media item (in the requested locale).
+
+    :param result: A dict of values returned by the controller action
+    :param type: dict
+    :returns: The dict with our additional template variable
+    :rtype: dict
+
+    """
+    url = url_for(controller='/media', action='view',
+                  slug=result['media'].slug, qualified=True)
+    url = localized_url(url, request_locale())
+    result['seo_canonical_link'] = Markup(u'<link rel="canonical" href="%s" />'
+                                          % escape(url, quote=True))
+    return result
+
+@observes(events.MediaController.view)
+@observes(events.MediaController.explore)
+@observes(events.PodcastsController.index)
+@observes(events.PodcastsController.view)
+@observes(events.CategoriesController.index)
+def add_hreflang_links(**result):
+    """Pass the ``hreflang`` alternate links of the page to the template.
+
+    The tags are available as ``seo_hreflang_links`` and point to the page
+    in every locale configured as ``seo.locales``. They are empty if no
+    locales are configured.
+
+    :param result: A dict of values returned by the controller action
+    :param type: dict
+    :returns: The dict with our additional template variable
+    :rtype: dict
+
+    """
+    result['seo_hreflang_links'] = Markup(hreflang_links(request.url))
+    return result
+
+@observes(events.MediaController.view)
+@observes(events.MediaController.explore)
+@observes(events.PodcastsController.index)
+@observes(events.PodcastsController.view)
+def add_social_tags(**result):
+    """Pass Open Graph and Twitter Card tags to the template.
+
+    The tags are available as ``seo_social_tags`` and use the same title
+    and description as the page's meta tags, except on a podcast's page
+    which is described by the podcast itself. Image details of media pages
+    were stored when the media item was saved.
+
+    :param result: A dict of values returned by the controller action
+    :param type: dict
+    :returns: The dict with our additional template variable
+    :rtype: dict
+
+    """
+    item = result.get('media')
+    podcast = result.get('podcast')
+    image = None
+    if isinstance(item, Media):
+        values = resolve_page('media', item)
+        values = dict(values, title=values['title'] or item.title)
+        url = url_for(controller='/media', action='view', slug=item.slug,
+                      qualified=True)
+        og_type = 'video.other'
+        image = get_seo_meta(item).get(SOCIAL_IMAGE_META_KEY)
+    elif podcast is not None:
+        # the podcast settings page values are only a fallback here, they
+        # would give every podcast the same title and description
+        values = resolve_page('podcast')
+        values = dict(values,
+            title=podcast.title or values['title'],
+            description=make_description(None, podcast.description)
+                or values['description'])
+        url = url_for(controller='/podcasts', action='view', slug=podcast.slug,
+                      qualified=True)
+        og_type = 'website'
+    else:
+        kind = 'podcasts' in result and 'podcast' or 'explore'
+        values = resolve_page(kind)
+        url = request.path_url
+        og_type = 'website'
+    url = localized_url(url, request_locale())
+    site_name = app_globals.settings.get('general_site_name')
+    result['seo_social_tags'] = Markup(social_tags(values, url, og_type,
+                                                   image, site_name))
     return result
 
 @observes(events.page_title, appendleft=True)
+@instrumented
 def seo_title(category=None, media=None, podcast=None, upload=None, **kwargs):
     """Return SEO modified title for a given page.
 
@@ -119,8 +493,10 @@ def seo_title(category=None, media=None, podcast=None, upload=None, **kwargs):
     and the default value supplied to page_title will be used.
 
     :param category: Optional value that when set to 'all' will return the
-        SEO setting for the category page.
-    :type category: string or None
+        SEO setting for the category page. If a
+        :class:`~mediacore.model.categories.Category` instance is passed in,
+        the values of that category (or its parents) will be returned.
+    :type category: string, Category or None
 
     :param media: Optional value that when set to 'all' will return the
         SEO setting for the Explore page. If, however a
@@ -139,26 +515,10 @@ def seo_title(category=None, media=None, podcast=None, upload=None, **kwargs):
     :rtype: String or None
 
     """
-    settings = app_globals.settings
-
-    if category == 'all':
-        setting = settings.get('seo_category_page_title', None)
-    elif media == 'all':
-        setting = settings.get('seo_explore_page_title', None)
-    elif media:
-        setting = media.meta.get('seo_page_title', None)
-    elif podcast == 'all':
-        setting = settings.get('seo_podcast_page_title', None)
-    elif upload == 'all':
-        setting = settings.get('seo_upload_page_title', None)
-    else:
-        return None
-
-    if setting:
-        return setting
-    return None
+    return _resolve(category, media, podcast, upload)['title']
 
 @observes(events.meta_keywords, appendleft=True)
+@instrumented
 def seo_meta_keywords(category=None, media=None,
                       podcast=None, upload=None, **kwargs):
     """Return SEO modified meta keywords information for a page.
@@ -172,8 +532,10 @@ def seo_meta_keywords(category=None, media=None,
     the meta_keywords event. If that value does not exist, we fallback to None.
 
     :param category: Optional value that when set to 'all' will return the
-        SEO setting for the category page.
-    :type category: string or None
+        SEO setting for the category page. If a
+        :class:`~mediacore.model.categories.Category` instance is passed in,
+        the values of that category (or its parents) will be returned.
+    :type category: string, Category or None
 
     :param media: Optional value that when set to 'all' will return the
         SEO setting for the Explore page. If, however a
@@ -192,29 +554,10 @@ def seo_meta_keywords(category=None, media=None,
     :rtype: String or None
 
     """
-    settings = app_globals.settings
-    general_meta = settings.get('seo_general_meta_keywords', None)
-    if not general_meta:
-        general_meta = None
-
-    if category == 'all':
-        setting = settings.get('seo_category_meta_keywords', general_meta)
-    elif media == 'all':
-        setting = settings.get('seo_explore_meta_keywords', general_meta)
-    elif media:
-        setting = media.meta.get('seo_meta_keywords', general_meta)
-    elif podcast == 'all':
-        setting = settings.get('seo_podcast_meta_keywords', general_meta)
-    elif upload == 'all':
-        setting = settings.get('seo_upload_meta_keywords', general_meta)
-    else:
-        return None
-
-    if setting:
-        return setting
-    return None
+    return _resolve(category, media, podcast, upload)['keywords']
 
 @observes(events.meta_description, appendleft=True)
+@instrumented
 def seo_meta_description(category=None, media=None,
                          podcast=None, upload=None, **kwargs):
     """Return SEO modified meta description information for a page.
@@ -228,8 +571,10 @@ def seo_meta_description(category=None, media=None,
     the meta_keywords event. If that value does not exist, we fallback to None.
 
     :param category: Optional value that when set to 'all' will return the
-        SEO setting for the category page.
-    :type category: string or None
+        SEO setting for the category page. If a
+        :class:`~mediacore.model.categories.Category` instance is passed in,
+        the values of that category (or its parents) will be returned.
+    :type category: string, Category or None
 
     :param media: Optional value that when set to 'all' will return the
         SEO setting for the Explore page. If, however a
@@ -248,29 +593,10 @@ def seo_meta_description(category=None, media=None,
     :rtype: String or None
 
     """
-    settings = app_globals.settings
-    general_desc = settings.get('seo_general_meta_description', None)
-    if not general_desc:
-        general_desc = None
-
-    if category == 'all':
-        setting = settings.get('seo_category_meta_description', general_desc)
-    elif media == 'all':
-        setting = settings.get('seo_explore_meta_description', general_desc)
-    elif media:
-        setting = media.meta.get('seo_meta_description', general_desc)
-    elif podcast == 'all':
-        setting = settings.get('seo_podcast_meta_description', general_desc)
-    elif upload == 'all':
-        setting = settings.get('seo_upload_meta_description', general_desc)
-    else:
-        return None
-
-    if setting:
-        return setting
-    return None
+    return _resolve(category, media, podcast, upload)['description']
 
 @observes(events.meta_robots_noindex, appendleft=True)
+@instrumented
 def seo_meta_robots(category=None, rss=None, **kwargs):
     """Return SEO modified Meta Robots information.
 
@@ -279,7 +605,9 @@ def seo_meta_robots(category=None, rss=None, **kwargs):
     while returning False will display it.
 
     :param category: Optional value that when set to 'all' will return the
-        inverse of the SEO setting in the database.
+        inverse of the SEO setting in the database. For a
+        :class:`~mediacore.model.categories.Category` the (inherited) flag
+        of that category is used.
 
     :param rss: Optional value that when set to 'all' will return the
         inverse of the RSS NOSEO setting in the database.
@@ -287,11 +615,4 @@ def seo_meta_robots(category=None, rss=None, **kwargs):
     :rtype: Bool
 
     """
-    settings = app_globals.settings
-
-    if category == 'all':
-        return not settings.get('seo_options_noindex_categories')
-    elif rss:
-        return not settings.get('seo_options_noindex_rss')
-    else:
-        return False
+    return resolve_page(robots_kind(category, rss), category=category)['robots']
@@ -0,0 +1,206 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""Helpers for migrations which insert settings or rewrite media meta.
+
+Like the migrations themselves this module only uses its own table
+definitions (and no plugin code importing the MediaCore models), so it keeps
+working when the models change.
+"""
+
+import sys
+import time
+
+from sqlalchemy import Integer, Unicode, UnicodeText
+from sqlalchemy import Column, ForeignKey, MetaData, Table, bindparam, func, select
+
+from mediacoreext.simplestation.seo.lib.batches import id_batches
+
+__all__ = [
+    'batched_meta_migration',
+    'bump_settings_version',
+    'insert_missing_settings',
+    'migration_batch_size',
+]
+
+# -- table definition ---------------------------------------------------------
+metadata = MetaData()
+settings = Table('settings', metadata,
+    Column('id', Integer, autoincrement=True, primary_key=True),
+    Column('key', Unicode(255), nullable=False, unique=True),
+    Column('value', UnicodeText),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+
+media = Table('media', metadata,
+    Column('id', Integer, autoincrement=True, primary_key=True),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+
+media_meta = Table('media_meta', metadata,
+    Column('id', Integer, autoincrement=True, primary_key=True),
+    Column('media_id', Integer, ForeignKey('media.id'), nullable=False),
+    Column('key', Unicode(64), nullable=False),
+    Column('value', UnicodeText),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+# -----------------------------------------------------------------------------
+
+DEFAULT_BATCH_SIZE = 1000
+
+def migration_batch_size(alembic_config=None):
+    """Return the batch size for data migrations.
+
+    It can be set as ``seo.migration_batch_size`` in the alembic config.
+
+    """
+    value = alembic_config and \
+        alembic_config.get_main_option('seo.migration_batch_size')
+    return int(value or DEFAULT_BATCH_SIZE)
+
+def insert_missing_settings(connection, defaults):
+    """Insert all settings which do not exist yet.
+
+    Existing keys are found with one query, the missing ones are inserted
+    with a single executemany (a multi-row INSERT with most drivers).
+
+    :param defaults: A list of ``(key, value)`` tuples.
+    :returns: The number of inserted settings.
+
+    """
+    keys = [key for key, value in defaults]
+    query = select([settings.c.key], settings.c.key.in_(keys))
+    existing = set(key for key, in connection.execute(query))
+    rows = [{'key': key, 'value': value}
+            for key, value in defaults if key not in existing]
+    if rows:
+        connection.execute(settings.insert(), rows)
+    return len(rows)
+
+def bump_settings_version(connection):
+    """Increment ``seo_settings_version`` so all workers reload the settings.
+
+    Migrations which add or change SEO settings call this, otherwise
+    running workers keep using their cached values.
+
+    """
+    query = select([settings.c.value],
+                   settings.c.key == u'seo_settings_version')
+    row = connection.execute(query).first()
+    if row is None:
+        connection.execute(settings.insert(),
+                           {'key': u'seo_settings_version', 'value': u'1'})
+        return
+    connection.execute(settings.update().
+        where(settings.c.key == u'seo_settings_version').
+        values(value=unicode(int(row[0] or 0) + 1)))
+
+
+def _progress_key(name):
+    return u'seo_migration_%s' % name
+
+def _load_meta(connection, media_ids, keys):
+    query = select([media_meta.c.id, media_meta.c.media_id,
+                    media_meta.c.key, media_meta.c.value],
+                   media_meta.c.media_id.in_(media_ids) &
+                   media_meta.c.key.in_(keys))
+    stored = dict((media_id, {}) for media_id in media_ids)
+    for meta_id, media_id, key, value in connection.execute(query):
+        stored[media_id][key] = (meta_id, value)
+    return stored
+
+def _write_meta(connection, changes, stored):
+    inserts, updates, deletes = [], [], []
+    for media_id, values in changes.iteritems():
+        for key, value in values.iteritems():
+            meta_id, old_value = stored[media_id].get(key, (None, None))
+            if value == old_value:
+                continue
+            if meta_id is None:
+                inserts.append({'media_id': media_id, 'key': key, 'value': value})
+            elif value is None:
+                deletes.append(meta_id)
+            else:
+                updates.append({'meta_id': meta_id, 'meta_value': value})
+    if inserts:
+        connection.execute(media_meta.insert(), inserts)
+    if updates:
+        connection.execute(media_meta.update().
+            where(media_meta.c.id == bindparam('meta_id')).
+            values(value=bindparam('meta_value')), updates)
+    if deletes:
+        connection.execute(media_meta.delete().where(media_meta.c.id.in_(deletes)))
+    return len(inserts) + len(updates) + len(deletes)
+
+def batched_meta_migration(engine, name, keys, transform,
+                           batch_size=DEFAULT_BATCH_SIZE, output=sys.stderr):
+    """Rewrite ``media_meta`` values in small transactions.
+
+    Media are processed in chunks of ``batch_size`` ids, every chunk in
+    a transaction of its own on a separate connection, so row locks are
+    only held for one chunk. The last processed media id is stored in the
+    setting ``seo_migration_<name>`` in the same transaction, which makes
+    an interrupted migration continue where it stopped; the setting is
+    removed once all media are done. Migrations using this can not run in
+    offline mode and must call it before they write to ``media_meta`` or
+    ``settings`` on their own connection, otherwise the chunk transactions
+    wait for the locks of the migration's transaction.
+
+    :param engine: The engine to connect to, e.g.
+        ``context.get_context().connection.engine``.
+    :param name: A unique name for the data migration (e.g. its revision).
+    :param keys: The meta keys which are passed to ``transform``.
+    :param transform: A callable ``transform(media_id, values)`` which
+        receives a dict with the current values of ``keys`` (missing keys
+        are absent) and returns a dict of new values, None removes a value.
+    :returns: The number of changed meta rows.
+
+    """
+    progress_key = _progress_key(name)
+    keys = list(keys)
+    connection = engine.connect()
+    try:
+        row = connection.execute(select([settings.c.value],
+            settings.c.key == progress_key)).first()
+        if row is None:
+            connection.execute(settings.insert(),
+                               {'key': progress_key, 'value': u'0'})
+            after_id = 0
+        else:
+            after_id = int(row[0] or 0)
+        max_id = connection.execute(select([func.max(media.c.id)])).scalar() or 0
+        changed = 0
+        started = time.time()
+        for media_ids in id_batches(connection.execute, media.c.id,
+                                    after_id, batch_size):
+            transaction = connection.begin()
+            try:
+                stored = _load_meta(connection, media_ids, keys)
+                changes = {}
+                for media_id in media_ids:
+                    values = dict((key, value) for key, (meta_id, value)
+                                  in stored[media_id].iteritems())
+                    changes[media_id] = transform(media_id, values) or {}
+                changed += _write_meta(connection, changes, stored)
+                after_id = media_ids[-1]
+                connection.execute(settings.update().
+                    where(settings.c.key == progress_key).
+                    values(value=unicode(after_id)))
+                transaction.commit()
+            except:
+                transaction.rollback()
+                raise
+            if output is not None:
+                output.write('%s: media up to id %d of %d done, %d meta rows changed (%.1fs)\n'
+                             % (name, after_id, max_id, changed, time.time() - started))
+        # finished, a new run of the same migration starts from scratch
+        connection.execute(settings.delete().where(settings.c.key == progress_key))
+        return changed
+    finally:
+        connection.close()
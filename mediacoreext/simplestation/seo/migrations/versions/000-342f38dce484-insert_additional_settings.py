@@ -25,10 +25,12 @@ revision = '342f38dce484'
 down_revision = None
 
 from alembic import context
-from alembic.op import execute, inline_literal
+from alembic.op import execute
 from sqlalchemy import Integer, Unicode, UnicodeText
 from sqlalchemy import Column, MetaData,  Table
 
+from mediacoreext.simplestation.seo.migrations.util import insert_missing_settings
+
 # -- table definition ---------------------------------------------------------
 metadata = MetaData()
 settings = Table('settings', metadata,
@@ -38,22 +40,6 @@ settings = Table('settings', metadata,
     mysql_engine='InnoDB',
     mysql_charset='utf8',
 )
-
-# -- helpers ------------------------------------------------------------------
-def insert_setting(key, value):
-    execute(
-        settings.insert().\
-            values({
-                'key': inline_literal(key),
-                'value': inline_literal(value),
-            })
-    )
-
-def delete_setting(key):
-    execute(
-        settings.delete().\
-            where(settings.c.key==inline_literal(key))
-    )
 # -----------------------------------------------------------------------------
 
 
@@ -80,13 +66,10 @@ def upgrade():
     if context.is_offline_mode():
         raise AssertionError('This migration can not be run in offline mode.')
     connection = context.get_context().connection
-    
-    for key, value in SEO_SETTINGS:
-        query = settings.select(settings.c.key == key)
-        result = connection.execute(query).first()
-        if result is None:
-            insert_setting(key, value)
+    insert_missing_settings(connection, SEO_SETTINGS)
 
 def downgrade():
-    for key, value in SEO_SETTINGS:
-        delete_setting(key)
+    execute(
+        settings.delete().\
+            where(settings.c.key.in_([key for key, value in SEO_SETTINGS]))
+    )
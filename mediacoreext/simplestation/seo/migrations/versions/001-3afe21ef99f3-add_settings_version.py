@@ -0,0 +1,58 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""add settings version
+
+Workers only reload the SEO settings when this counter changed. It is bumped
+whenever the SEO settings are saved.
+
+added: 2013-06-12 (v0.11dev)
+
+Revision ID: 3afe21ef99f3
+Revises: 342f38dce484
+Create Date: 2013-06-12 14:31:07.512203
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3afe21ef99f3'
+down_revision = '342f38dce484'
+
+from alembic import context
+from alembic.op import execute, inline_literal
+from sqlalchemy import Integer, Unicode, UnicodeText
+from sqlalchemy import Column, MetaData,  Table
+
+from mediacoreext.simplestation.seo.migrations.util import insert_missing_settings
+
+# -- table definition ---------------------------------------------------------
+metadata = MetaData()
+settings = Table('settings', metadata,
+    Column('id', Integer, autoincrement=True, primary_key=True),
+    Column('key', Unicode(255), nullable=False, unique=True),
+    Column('value', UnicodeText),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+
+# -- helpers ------------------------------------------------------------------
+def delete_setting(key):
+    execute(
+        settings.delete().\
+            where(settings.c.key==inline_literal(key))
+    )
+# -----------------------------------------------------------------------------
+
+def upgrade():
+    if context.is_offline_mode():
+        raise AssertionError('This migration can not be run in offline mode.')
+    connection = context.get_context().connection
+    # Starting at 1 invalidates whatever the workers cached before. The
+    # setting may exist already if the settings were saved before this
+    # migration ran.
+    insert_missing_settings(connection, [(u'seo_settings_version', u'1')])
+
+def downgrade():
+    delete_setting(u'seo_settings_version')
@@ -0,0 +1,58 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""add auto fallbacks setting
+
+Opt-in flag for generating meta descriptions and keywords from the media
+details when a media item is saved.
+
+added: 2013-06-19 (v0.11dev)
+
+Revision ID: 4dec9c71fcd7
+Revises: 3afe21ef99f3
+Create Date: 2013-06-19 11:02:44.180517
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4dec9c71fcd7'
+down_revision = '3afe21ef99f3'
+
+from alembic import context
+from alembic.op import execute, inline_literal
+from sqlalchemy import Integer, Unicode, UnicodeText
+from sqlalchemy import Column, MetaData,  Table
+
+from mediacoreext.simplestation.seo.migrations.util import (bump_settings_version,
+    insert_missing_settings)
+
+# -- table definition ---------------------------------------------------------
+metadata = MetaData()
+settings = Table('settings', metadata,
+    Column('id', Integer, autoincrement=True, primary_key=True),
+    Column('key', Unicode(255), nullable=False, unique=True),
+    Column('value', UnicodeText),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+
+# -- helpers ------------------------------------------------------------------
+def delete_setting(key):
+    execute(
+        settings.delete().\
+            where(settings.c.key==inline_literal(key))
+    )
+# -----------------------------------------------------------------------------
+
+def upgrade():
+    if context.is_offline_mode():
+        raise AssertionError('This migration can not be run in offline mode.')
+    connection = context.get_context().connection
+    insert_missing_settings(connection, [(u'seo_options_auto_fallbacks', u'')])
+    # make running workers pick up the new setting
+    bump_settings_version(connection)
+
+def downgrade():
+    delete_setting(u'seo_options_auto_fallbacks')
@@ -0,0 +1,38 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""add redirects table
+
+Old URLs of renamed media are redirected to their new location.
+
+added: 2013-06-26 (v0.11dev)
+
+Revision ID: a4692f480382
+Revises: 4dec9c71fcd7
+Create Date: 2013-06-26 09:47:13.402871
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a4692f480382'
+down_revision = '4dec9c71fcd7'
+
+from alembic.op import create_index, create_table, drop_table
+from sqlalchemy import Column, DateTime, Integer, Unicode
+
+
+def upgrade():
+    create_table('seo_redirects',
+        Column('id', Integer, autoincrement=True, primary_key=True),
+        Column('source', Unicode(255), nullable=False, unique=True),
+        Column('target', Unicode(255), nullable=True),
+        Column('modified_on', DateTime, nullable=False),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8',
+    )
+    create_index('seo_redirects_modified_on', 'seo_redirects', ['modified_on'])
+
+def downgrade():
+    drop_table('seo_redirects')
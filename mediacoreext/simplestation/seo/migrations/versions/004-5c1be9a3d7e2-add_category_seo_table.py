@@ -0,0 +1,40 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""add category seo table
+
+SEO values and noindex flags for single categories.
+
+added: 2013-06-28 (v0.11dev)
+
+Revision ID: 5c1be9a3d7e2
+Revises: a4692f480382
+Create Date: 2013-06-28 14:21:37.550139
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5c1be9a3d7e2'
+down_revision = 'a4692f480382'
+
+from alembic.op import create_table, drop_table
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, UnicodeText
+
+
+def upgrade():
+    create_table('seo_categories',
+        Column('category_id', Integer,
+            ForeignKey('categories.id', onupdate='CASCADE', ondelete='CASCADE'),
+            primary_key=True, autoincrement=False),
+        Column('page_title', UnicodeText),
+        Column('meta_description', UnicodeText),
+        Column('meta_keywords', UnicodeText),
+        Column('noindex', Boolean),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8',
+    )
+
+def downgrade():
+    drop_table('seo_categories')
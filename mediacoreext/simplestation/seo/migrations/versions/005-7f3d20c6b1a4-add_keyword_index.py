@@ -0,0 +1,49 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""add keyword index
+
+Normalized SEO keywords and their media. Run mediacore-seo-keywords to
+index the existing media.
+
+added: 2013-07-03 (v0.11dev)
+
+Revision ID: 7f3d20c6b1a4
+Revises: 5c1be9a3d7e2
+Create Date: 2013-07-03 16:05:12.873310
+"""
+
+# revision identifiers, used by Alembic.
+revision = '7f3d20c6b1a4'
+down_revision = '5c1be9a3d7e2'
+
+from alembic.op import create_index, create_table, drop_table
+from sqlalchemy import Column, ForeignKey, Integer, Unicode
+
+
+def upgrade():
+    create_table('seo_keywords',
+        Column('id', Integer, autoincrement=True, primary_key=True),
+        Column('name', Unicode(255), nullable=False, unique=True),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8',
+    )
+    create_table('seo_media_keywords',
+        Column('media_id', Integer,
+            ForeignKey('media.id', onupdate='CASCADE', ondelete='CASCADE'),
+            primary_key=True, autoincrement=False),
+        Column('keyword_id', Integer,
+            ForeignKey('seo_keywords.id', onupdate='CASCADE', ondelete='CASCADE'),
+            primary_key=True, autoincrement=False),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8',
+    )
+    create_index('seo_media_keywords_keyword_id', 'seo_media_keywords',
+                 ['keyword_id', 'media_id'])
+
+def downgrade():
+    drop_table('seo_media_keywords')
+    drop_table('seo_keywords')
@@ -0,0 +1,55 @@
+# This file is a part of the SEO plugin for MediaCore CE, http://mediacorecommunity.org
+# Copyright 2010-2013 MediaCore Inc., Felix Schwarz and other contributors.
+# For the exact contribution history, see the git revision log.
+# The source code contained in this file is licensed under the GPLv3 or
+# (at your option) any later version.
+# See LICENSE.txt in the main project directory, for more information.
+"""add meta version
+
+Counter bumped whenever the SEO meta of a media item is written. Workers
+key their cached page values on it instead of the media modification date.
+
+added: 2013-07-10 (v0.11dev)
+
+Revision ID: 9b2e61d4c8f0
+Revises: 7f3d20c6b1a4
+Create Date: 2013-07-10 10:24:51.402817
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9b2e61d4c8f0'
+down_revision = '7f3d20c6b1a4'
+
+from alembic import context
+from alembic.op import execute, inline_literal
+from sqlalchemy import Integer, Unicode, UnicodeText
+from sqlalchemy import Column, MetaData,  Table
+
+from mediacoreext.simplestation.seo.migrations.util import insert_missing_settings
+
+# -- table definition ---------------------------------------------------------
+metadata = MetaData()
+settings = Table('settings', metadata,
+    Column('id', Integer, autoincrement=True, primary_key=True),
+    Column('key', Unicode(255), nullable=False, unique=True),
+    Column('value', UnicodeText),
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
+
+# -- helpers ------------------------------------------------------------------
+def delete_setting(key):
+    execute(
+        settings.delete().\
+            where(settings.c.key==inline_literal(key))
+    )
+# -----------------------------------------------------------------------------
+
+def upgrade():
+    if context.is_offline_mode():
+        raise AssertionError('This migration can not be run in offline mode.')
+    connection = context.get_context().connection
+    insert_missing_settings(connection, [(u'seo_meta_version', u'1')])
+
+def downgrade():
+    delete_setting(u'seo_meta_version')
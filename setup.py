@@ -27,6 +27,15 @@ setup(
     ],
     entry_points = {
         'mediacore.plugin': ['seo = mediacoreext.simplestation.seo.mediacore_plugin'],
+        'console_scripts': [
+            'mediacore-seo-sitemaps = mediacoreext.simplestation.seo.commands.sitemaps:main',
+            'mediacore-seo-import = mediacoreext.simplestation.seo.commands.seo_meta:import_main',
+            'mediacore-seo-export = mediacoreext.simplestation.seo.commands.seo_meta:export_main',
+            'mediacore-seo-fallbacks = mediacoreext.simplestation.seo.commands.fallbacks:main',
+            'mediacore-seo-structured-data = mediacoreext.simplestation.seo.commands.structured_data:main',
+            'mediacore-seo-audit = mediacoreext.simplestation.seo.commands.audit:main',
+            'mediacore-seo-keywords = mediacoreext.simplestation.seo.commands.keywords:main',
+        ],
     },
     message_extractors = {'mediacoreext/simplestation/seo': [
         ('**.py', 'python', None),